@@ -0,0 +1,87 @@
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Boolean, Index
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex
+from datetime import datetime
+import os
+
+# Database setup: any SQLAlchemy URL, e.g. postgresql://user:password@db:5432/sports_analysis
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sports_analysis.db")
+
+# Connection pool settings (server databases)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, before server-side idle timeouts
+
+# SQLite settings
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+
+def _create_engine(url):
+    if url.startswith("sqlite"):
+        # API and worker processes share the file, wait for write locks instead of failing
+        engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT})
+        in_memory = url in ("sqlite://", "sqlite:///:memory:")
+
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if SQLITE_WAL and not in_memory:
+                # Readers no longer block the writer (and the other way round), and
+                # commits append to the log instead of syncing the whole database
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA cache_size=-16000")  # 16 MB page cache per connection
+            cursor.close()
+        return engine
+
+    # Pooled connections, checked before use so a restarted server does not fail requests
+    return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                         pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=True)
+
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+# Database Models
+class User(Base):
+    __tablename__ = "users"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True)
+    phone = Column(String, unique=True, index=True)
+    hashed_password = Column(String)
+    full_name = Column(String)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Video(Base):
+    __tablename__ = "videos"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True)
+    original_filename = Column(String)
+    processed_filename = Column(String)
+    status = Column(String, default="processing")  # processing, completed, failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processing_time = Column(Integer)  # in seconds
+
+    # Serves a user's video list newest first, see GET /videos
+    __table_args__ = (Index("ix_videos_user_created", "user_id", "created_at"),)
+
+
+def init_db():
+    """
+    Create missing tables, and indexes that were added to a table after it
+    was created, which create_all alone leaves out
+    """
+    Base.metadata.create_all(bind=engine)
+    # IF NOT EXISTS, as the API and every worker process run this at startup
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, Video
+from job_queue import Job
+
+# Streaming settings
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", "1.0"))
+KEEPALIVE_INTERVAL = 15.0
+
+
+class ProgressBroadcaster:
+    """
+    Fans video processing progress out to streaming clients.
+
+    Workers store progress on their job row. A single polling task reads the
+    state of every watched video in one query per interval, however many
+    clients are connected, and pushes a snapshot to each subscriber only when
+    it changed.
+    """
+
+    def __init__(self, interval=PROGRESS_POLL_INTERVAL):
+        self.interval = interval
+        self._subscribers = {}  # video_id -> set of asyncio.Queue
+        self._last = {}
+        self._task = None
+
+    def subscribe(self, video_id):
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(video_id, set()).add(queue)
+        if video_id in self._last:
+            queue.put_nowait(self._last[video_id])
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, video_id, queue):
+        queues = self._subscribers.get(video_id, set())
+        queues.discard(queue)
+        if not queues:
+            self._subscribers.pop(video_id, None)
+            self._last.pop(video_id, None)
+
+    @staticmethod
+    def _snapshot(video_ids):
+        """Current status and latest job progress of each video"""
+        db = SessionLocal()
+        try:
+            states = {
+                video.id: {
+                    'video_id': video.id,
+                    'status': video.status,
+                    'processing_time': video.processing_time,
+                    'job_status': None,
+                    'attempts': 0,
+                    'progress': None
+                } for video in db.query(Video).filter(Video.id.in_(video_ids))
+            }
+            # Ascending ids, so a video's latest job wins
+            for job in db.query(Job).filter(Job.video_id.in_(video_ids)).order_by(Job.id):
+                if job.video_id in states:
+                    states[job.video_id].update({
+                        'job_status': job.status,
+                        'attempts': job.attempts,
+                        'progress': json.loads(job.progress) if job.progress else None
+                    })
+            return states
+        finally:
+            db.close()
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                states = await run_in_threadpool(self._snapshot, list(self._subscribers))
+            except Exception as e:
+                print(f"Progress poll failed: {str(e)}")
+                states = {}
+            for video_id, state in states.items():
+                if state == self._last.get(video_id) or video_id not in self._subscribers:
+                    continue
+                self._last[video_id] = state
+                for queue in self._subscribers[video_id]:
+                    queue.put_nowait(state)
+            await asyncio.sleep(self.interval)
+
+    async def stream(self, video_id):
+        """Server-Sent Events for one video, ending once processing has finished"""
+        queue = self.subscribe(video_id)
+        try:
+            while True:
+                try:
+                    state = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+                if state['status'] != "processing":
+                    break
+        finally:
+            self.unsubscribe(video_id, queue)
+
+
+# Shared instance for this API process
+progress_broadcaster = ProgressBroadcaster()
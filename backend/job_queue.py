@@ -0,0 +1,220 @@
+import json
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Index, func, or_
+
+from database import Base, Video
+
+# Retry and liveness settings
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, index=True)
+    kind = Column(String, default="process")  # process (detect, track, render) or render (from stored tracks)
+    input_path = Column(String)
+    output_path = Column(String)
+    params = Column(Text, default="{}")  # JSON keyword arguments for process_video
+    cache_key = Column(String(64), index=True)  # result cache entry this job fills, if any
+    status = Column(String, default="queued")  # queued, running, completed, failed
+    priority = Column(Integer, default=0)  # higher runs first
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=MAX_ATTEMPTS)
+    available_at = Column(DateTime, default=datetime.utcnow)
+    worker_id = Column(String)
+    heartbeat_at = Column(DateTime)
+    last_error = Column(Text)
+    progress = Column(Text)  # JSON {stage, frames_done, total_frames, fps, eta} from the worker
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (Index("ix_jobs_claim", "status", "priority", "available_at"),)
+
+
+class Worker(Base):
+    __tablename__ = "workers"
+
+    id = Column(String, primary_key=True)  # host:pid
+    host = Column(String)
+    pid = Column(Integer)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime)
+    model_load_time = Column(Float)
+    current_job_id = Column(Integer)
+    jobs_done = Column(Integer, default=0)
+    busy_seconds = Column(Float, default=0.0)
+    metrics = Column(Text)  # JSON PipelineMetrics totals over the jobs this worker ran
+
+
+def worker_identity():
+    host = socket.gethostname()
+    return f"{host}:{os.getpid()}", host, os.getpid()
+
+
+def enqueue_job(db, video_id, input_path, output_path, params=None, priority=0, cache_key=None, kind="process"):
+    """Persist a processing job; workers pick it up by priority, then age"""
+    job = Job(
+        video_id=video_id,
+        kind=kind,
+        input_path=input_path,
+        output_path=output_path,
+        params=json.dumps(params or {}),
+        priority=priority,
+        cache_key=cache_key
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_job(db, worker_id):
+    """
+    Atomically take the next runnable job, or return None.
+
+    Claims are a conditional UPDATE on status, so concurrent workers on any
+    host never run the same job twice.
+    """
+    now = datetime.utcnow()
+    # Hold back duplicates of a video being processed right now, they are served from its cached result
+    running_keys = db.query(Job.cache_key).filter(Job.status == "running", Job.cache_key.isnot(None))
+    candidates = (
+        db.query(Job.id)
+        .filter(Job.status == "queued", Job.available_at <= now)
+        .filter(or_(Job.cache_key.is_(None), Job.cache_key.notin_(running_keys)))
+        .order_by(Job.priority.desc(), Job.id)
+        .limit(8)
+        .all()
+    )
+    for (job_id,) in candidates:
+        claimed = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.status == "queued")
+            .update({
+                Job.status: "running",
+                Job.worker_id: worker_id,
+                Job.heartbeat_at: now,
+                Job.started_at: now,
+                Job.attempts: Job.attempts + 1,
+                Job.progress: None
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed == 1:
+            return db.query(Job).filter(Job.id == job_id).first()
+    return None
+
+
+def heartbeat(db, job_id, worker_id):
+    """Refresh a running job's liveness; False if the job was taken away"""
+    updated = (
+        db.query(Job)
+        .filter(Job.id == job_id, Job.worker_id == worker_id, Job.status == "running")
+        .update({Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return updated == 1
+
+
+def update_progress(db, job_id, progress):
+    db.query(Job).filter(Job.id == job_id).update(
+        {Job.progress: json.dumps(progress)}, synchronize_session=False
+    )
+    db.commit()
+
+
+def _owned_by(db, job_id, worker_id):
+    """The job's row, as long as worker_id still runs it"""
+    return db.query(Job).filter(Job.id == job_id, Job.worker_id == worker_id, Job.status == "running")
+
+
+def complete_job(db, job, processing_time, worker_id):
+    """Mark the job completed; False, writing nothing, if worker_id no longer owns it"""
+    job_id, video_id, kind = job.id, job.video_id, job.kind
+    finished = _owned_by(db, job_id, worker_id).update(
+        {Job.status: "completed", Job.finished_at: datetime.utcnow()}, synchronize_session=False
+    )
+    if finished == 0:
+        db.rollback()
+        return False
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if video:
+        video.status = "completed"
+        # Restyling keeps the time it took to analyse the video
+        if kind != "render":
+            video.processing_time = processing_time
+    db.commit()
+    return True
+
+
+def fail_job(db, job, error, worker_id, stale_before=None):
+    """
+    Schedule a retry with exponential backoff, or give up after max_attempts.
+
+    Only applies while worker_id still runs the job (and, with stale_before,
+    has not heartbeated since), returns False otherwise.
+    """
+    job_id, video_id, kind = job.id, job.video_id, job.kind
+    attempts, max_attempts = job.attempts, job.max_attempts
+    fields = {Job.last_error: str(error), Job.worker_id: None}
+    if attempts < max_attempts:
+        fields[Job.status] = "queued"
+        fields[Job.available_at] = datetime.utcnow() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    else:
+        fields[Job.status] = "failed"
+        fields[Job.finished_at] = datetime.utcnow()
+
+    query = _owned_by(db, job_id, worker_id)
+    if stale_before is not None:
+        query = query.filter(Job.heartbeat_at < stale_before)
+    if query.update(fields, synchronize_session=False) == 0:
+        db.rollback()
+        return False
+    if fields[Job.status] == "failed":
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video:
+            # A failed re-render leaves the previous output untouched
+            video.status = "completed" if kind == "render" else "failed"
+    db.commit()
+    return True
+
+
+def requeue_stale(db, stale_after=STALE_AFTER):
+    """Recover running jobs whose worker stopped heartbeating (crash, restart, lost host)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    stale = db.query(Job).filter(Job.status == "running", Job.heartbeat_at < cutoff).all()
+    recovered = 0
+    for job in stale:
+        worker_id = job.worker_id
+        print(f"Recovering stale job {job.id} from worker {worker_id}")
+        recovered += fail_job(db, job, f"worker {worker_id} stopped heartbeating", worker_id, stale_before=cutoff)
+    return recovered
+
+
+def queue_stats(db):
+    """Job counts by status plus live workers"""
+    counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER)
+    workers = db.query(Worker).filter(Worker.heartbeat_at >= cutoff).all()
+    return {
+        "jobs": {status: counts.get(status, 0) for status in ("queued", "running", "completed", "failed")},
+        "workers": [
+            {
+                "id": w.id,
+                "current_job_id": w.current_job_id,
+                "jobs_done": w.jobs_done,
+                "busy_seconds": w.busy_seconds,
+                "model_load_time": w.model_load_time,
+                "started_at": w.started_at
+            } for w in workers
+        ]
+    }
@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from model_pool import DEFAULT_MODEL
+from video_processor import VideoProcessor, OverlayRenderer, TRACKER_PARAMS, open_video_writer
+from utils.sort import BatchSort
+from utils.keyframes import KeyframeScheduler
+from utils.metrics import PipelineMetrics
+
+# Live mode settings
+LATENCY_BUDGET = float(os.getenv("LIVE_LATENCY_BUDGET", "0.25"))  # seconds from capture to output
+LATENCY_WINDOW = int(os.getenv("LIVE_LATENCY_WINDOW", "10000"))  # frames kept for percentiles
+
+
+class LatestFrameGrabber:
+    """
+    Reads a source on its own thread and keeps only the newest frame, so a
+    slow consumer skips stale frames instead of falling further behind.
+
+    With realtime, reading is paced to the source frame rate, which turns a
+    local file into a stand-in for a camera or RTSP stream.
+    """
+
+    def __init__(self, reader, realtime=False):
+        self.reader = reader
+        self.realtime = realtime
+        self.grabbed = 0
+        self._cond = threading.Condition()
+        self._latest = None
+        self._ended = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-grabber", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                if self.realtime:
+                    delay = start + self.grabbed / self.reader.fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                ret, frame = self.reader.read()
+                if not ret:
+                    break
+                with self._cond:
+                    self._latest = (self.grabbed, time.perf_counter(), frame)
+                    self.grabbed += 1
+                    self._cond.notify()
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify()
+
+    def next(self, after):
+        """Newest (index, capture time, frame) past index `after`, None once the source has ended"""
+        with self._cond:
+            while not self._ended and (self._latest is None or self._latest[0] <= after):
+                self._cond.wait(0.5)
+            if self._latest is None or self._latest[0] <= after:
+                return None
+            return self._latest
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def latency_percentiles(samples):
+    """p50/p90/p95/p99/max of latency samples in seconds, reported in milliseconds"""
+    if not samples:
+        return {}
+    values = np.percentile(np.asarray(samples) * 1000, [50, 90, 95, 99, 100])
+    return {name: round(float(v), 1) for name, v in zip(('p50', 'p90', 'p95', 'p99', 'max'), values)}
+
+
+class LiveProcessor(VideoProcessor):
+    """
+    Tracks and annotates a live source while keeping up with it.
+
+    Every iteration takes the newest captured frame. Frames dropped in between
+    still advance the tracker on its motion model, so tracks stay in place.
+    Detection is skipped, and the frame tracked on the Kalman prediction
+    alone, when the frame is already so old that running YOLO would overshoot
+    the latency budget. After max_age frames without a detection one runs
+    regardless, so tracks are not lost when YOLO alone exceeds the budget.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stop = threading.Event()
+
+    def run(self, source, output_path=None, hls_dir=None, on_frame=None, on_event=None, on_stats=None,
+            latency_budget=LATENCY_BUDGET, realtime=None, trail_len=30, heatmap=False, detect_every=1,
+            uncertainty_threshold=None, duration=None, stats_interval=1.0):
+        """
+        Process a stream until it ends, `duration` seconds pass or stop() is called
+
+        Args:
+            source (str): File path or any URL OpenCV/FFmpeg can open (rtsp://, http://)
+            output_path (str): Also encode the annotated frames here
+            hls_dir (str): Also write the annotated stream as HLS segments here
+            on_frame (callable): (annotated frame, FrameTracks) for every processed frame
+            on_event (callable): Receives track events as dicts ('tracks' per
+                processed frame, 'track_started', 'track_lost')
+            on_stats (callable): Receives a stats snapshot every stats_interval seconds
+            latency_budget (float): Seconds from capture to output a frame should stay within
+            realtime (bool): Pace reading to the source frame rate, default for local files
+
+        Returns:
+            dict: Final stats with end-to-end latency percentiles
+        """
+        if realtime is None:
+            realtime = os.path.exists(source)
+        self._stop.clear()
+        reader = self._open_video(source)
+        fps = reader.fps
+        grabber = LatestFrameGrabber(reader, realtime)
+
+        out = None
+        if output_path or hls_dir:
+            out = open_video_writer(output_path, fps, reader.width, reader.height, hls_dir)
+        tracker = BatchSort(**TRACKER_PARAMS)
+        renderer = OverlayRenderer(reader.width, reader.height, fps, trail_len, heatmap,
+                                   expire_after=tracker.max_age + 1)
+        stats = {
+            'processed_frames': 0,
+            'dropped_frames': 0,
+            'detected_frames': 0,
+            'budget_skips': 0,
+            'keyframes': 0
+        }
+        metrics = PipelineMetrics()
+        state = {
+            'reader': reader,
+            'stats': stats,
+            'labels': {},
+            'scheduler': KeyframeScheduler(detect_every, None, uncertainty_threshold),
+            'drift': {'predicted': 0, 'matched': 0, 'iou_sum': 0.0},
+            'metrics': metrics
+        }
+        latencies = deque(maxlen=LATENCY_WINDOW)
+        last_seen = {}
+        infer_time = 0.0  # moving average of one detection pass
+        coasted = 0  # processed frames since the last detection
+        last = -1
+        start = last_report = time.perf_counter()
+
+        def snapshot():
+            elapsed = time.perf_counter() - start
+            return dict(stats, source_frames=grabber.grabbed, elapsed=round(elapsed, 2),
+                        fps=round(stats['processed_frames'] / elapsed, 2) if elapsed > 0 else 0.0,
+                        latency_ms=latency_percentiles(latencies))
+
+        try:
+            while not self._stop.is_set():
+                if duration is not None and time.perf_counter() - start >= duration:
+                    break
+                item = grabber.next(last)
+                if item is None:
+                    break
+                index, captured, frame = item
+
+                # Keep the motion model in step with the frames that were skipped,
+                # they also age the tracks so undetected ones still expire under load
+                step = index - last
+                for _ in range(step - 1):
+                    tracker.coast(dropped=True)
+                stats['dropped_frames'] += step - 1
+                last = index
+
+                # Only detect if the result can still be on time, unless tracks
+                # have coasted so long that they would be lost
+                results = None
+                if state['scheduler'].is_keyframe(frame):
+                    on_time = time.perf_counter() - captured + infer_time <= latency_budget
+                    if on_time or coasted >= tracker.max_age:
+                        t = time.perf_counter()
+                        results = self._infer([reader.resize_for_inference(frame)])[0]
+                        elapsed = time.perf_counter() - t
+                        metrics.add('infer', elapsed)
+                        infer_time = elapsed if infer_time == 0 else 0.2 * elapsed + 0.8 * infer_time
+                    else:
+                        stats['budget_skips'] += 1
+
+                frame_tracks = self._track_frame(frame, results, tracker, state)
+                stats['detected_frames'] += frame_tracks.detected
+                coasted = 0 if frame_tracks.detected else coasted + 1
+                # One trail step spans every source frame since the last one processed
+                renderer.fps = fps / step
+                with metrics.stage('draw'):
+                    vis_frame = renderer.draw(frame, frame_tracks.tracks, frame_tracks.labels,
+                                              frame_tracks.detected)
+                with metrics.stage('heatmap'):
+                    vis_frame = renderer.blend_heatmap(vis_frame)
+                metrics.tracks_per_frame.observe(len(frame_tracks.tracks))
+
+                if out is not None:
+                    # Repeat the frame for skipped ones so the output keeps real time
+                    with metrics.stage('encode'):
+                        for _ in range(step):
+                            out.write(vis_frame)
+                if on_frame is not None:
+                    on_frame(vis_frame, frame_tracks)
+                if on_event is not None:
+                    self._emit_events(on_event, index, captured - start, frame_tracks, renderer, last_seen,
+                                      stats['processed_frames'])
+
+                latencies.append(time.perf_counter() - captured)
+                stats['processed_frames'] += 1
+
+                if on_stats is not None and time.perf_counter() - last_report >= stats_interval:
+                    last_report = time.perf_counter()
+                    on_stats(snapshot())
+        finally:
+            grabber.stop()
+            reader.release()
+            if out is not None:
+                out.release()
+
+        stats['players_detected'] = len(renderer.players_detected)
+        stats['ball_detections'] = renderer.ball_detections
+        stats['stage_seconds'] = metrics.to_dict()['stage_seconds']
+        return snapshot()
+
+    @staticmethod
+    def _emit_events(on_event, index, timestamp, frame_tracks, renderer, last_seen, processed,
+                     lost_after=TRACKER_PARAMS['max_age'] + 1):
+        tracks = []
+        for row, label, conf in zip(frame_tracks.tracks.tolist(), frame_tracks.labels,
+                                    frame_tracks.confidence.tolist()):
+            tid = int(row[4])
+            if tid not in last_seen:
+                on_event({'type': 'track_started', 'frame': index, 'id': tid, 'label': label})
+            last_seen[tid] = processed
+            vx, vy = renderer.velocities.get(tid, (0.0, 0.0))
+            tracks.append({
+                'id': tid,
+                'label': label,
+                'box': [round(v, 1) for v in row[:4]],
+                'confidence': None if conf != conf else round(conf, 3),
+                'velocity': [round(float(vx), 1), round(float(vy), 1)]
+            })
+        on_event({'type': 'tracks', 'frame': index, 'time': round(timestamp, 3),
+                  'detected': frame_tracks.detected, 'tracks': tracks})
+
+        for tid in [tid for tid, seen in last_seen.items() if processed - seen >= lost_after]:
+            del last_seen[tid]
+            on_event({'type': 'track_lost', 'frame': index, 'id': tid})
+
+    def stop(self):
+        """Ask a running run() to finish after the current frame"""
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track a live video source in real time")
+    parser.add_argument("source", help="RTSP/HTTP URL, device path or video file (played at real-time pace)")
+    parser.add_argument("--output", help="Write annotated video here")
+    parser.add_argument("--hls-dir", help="Write the annotated stream as HLS segments here")
+    parser.add_argument("--events", help="Write track events here as JSON lines ('-' for stdout)")
+    parser.add_argument("--budget", type=float, default=LATENCY_BUDGET, help="Latency budget in seconds")
+    parser.add_argument("--detect-every", type=int, default=1, help="Run YOLO on every Nth processed frame")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--no-realtime", action="store_true", help="Read files as fast as possible")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="YOLO weights")
+    args = parser.parse_args()
+
+    events = None
+    if args.events:
+        events = sys.stdout if args.events == "-" else open(args.events, "w")
+
+    processor = LiveProcessor(args.model)
+    # Ctrl+C finishes the current frame, then the stats are still printed
+    signal.signal(signal.SIGINT, lambda *_: processor.stop())
+    try:
+        stats = processor.run(
+            args.source, output_path=args.output, hls_dir=args.hls_dir,
+            on_event=(lambda e: events.write(json.dumps(e) + "\n")) if events else None,
+            on_stats=lambda s: print(f"{s['fps']:.1f} fps, dropped {s['dropped_frames']}, "
+                                     f"latency {s['latency_ms']}", file=sys.stderr),
+            latency_budget=args.budget, realtime=False if args.no_realtime else None,
+            detect_every=args.detect_every, duration=args.duration
+        )
+    finally:
+        if events not in (None, sys.stdout):
+            events.close()
+
+    print(json.dumps(stats, indent=2))
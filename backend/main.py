@@ -1,54 +1,42 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, EmailStr, conint, conlist
+from typing import Optional, List, Dict, Literal
 import jwt
 import bcrypt
 import os
-import uuid
+import hashlib
+import hmac
+import base64
+import json
 from datetime import datetime, timedelta
-import shutil
 from pathlib import Path
 import subprocess
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sports_analysis.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Database Models
-class User(Base):
-    __tablename__ = "users"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True)
-    phone = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
-    full_name = Column(String)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-class Video(Base):
-    __tablename__ = "videos"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, index=True)
-    original_filename = Column(String)
-    processed_filename = Column(String)
-    status = Column(String, default="processing")  # processing, completed, failed
-    created_at = Column(DateTime, default=datetime.utcnow)
-    processing_time = Column(Integer)  # in seconds
+from database import init_db, SessionLocal, User, Video
+from job_queue import enqueue_job, queue_stats
+from events import progress_broadcaster
+from media import resolve_media_path, media_response
+from metrics import render_metrics
+from user_cache import user_cache
+from utils.metrics import PrometheusText
+import result_cache
+from utils.tracks_io import tracks_path_for
+from uploads import (
+    Upload, UploadTooLarge, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, new_upload_id, partial_path,
+    stream_to_file, iter_upload_file, resume_hasher, remember_hasher, finish_hash
+)
+from starlette.concurrency import run_in_threadpool
+from worker import start_workers, stop_workers, JOB_WORKERS
 
 # Create tables
-Base.metadata.create_all(bind=engine)
+init_db()
 
 # Pydantic models
 class UserCreate(BaseModel):
@@ -69,6 +57,27 @@ class UserResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    content_type: str
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    size: Optional[int]
+    received: int
+    chunk_size: int
+    status: str
+
+Color = conlist(conint(ge=0, le=255), min_length=3, max_length=3)
+
+class RenderRequest(BaseModel):
+    trail_len: conint(ge=1, le=300) = 30
+    heatmap: bool = True
+    # BGR overrides for overlay elements, the rest keep their default color
+    colors: Dict[Literal["person", "object", "trail", "velocity", "prediction"], Color] = {}
+
 class VideoResponse(BaseModel):
     id: int
     original_filename: str
@@ -77,12 +86,30 @@ class VideoResponse(BaseModel):
     created_at: datetime
     processing_time: Optional[int]
 
+class VideoSummary(BaseModel):
+    total: int
+    completed: int
+    processing: int
+    failed: int
+
 # JWT Configuration
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Bearer token for the operational endpoints (queue, workers, metrics), so
+# monitoring can call them without a user login; unset = any logged-in user
+OPS_TOKEN = os.getenv("OPS_TOKEN")
+
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Slack for multipart boundaries and headers on top of MAX_UPLOAD_SIZE
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Video list page sizes
+VIDEO_PAGE_SIZE = int(os.getenv("VIDEO_PAGE_SIZE", "50"))
+VIDEO_PAGE_MAX = int(os.getenv("VIDEO_PAGE_MAX", "200"))
 
 # FastAPI app
 app = FastAPI(title="Sports Video Analysis API", version="1.0.0")
@@ -94,13 +121,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"],
 )
 
 # Static files
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("processed", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.mount("/processed", StaticFiles(directory="processed"), name="processed")
 
 # Dependency to get DB session
 def get_db():
@@ -124,62 +151,55 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+def user_from_token(token: str, db: Session):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    except jwt.PyJWTError:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user_id = int(payload["sub"])
+    except (jwt.PyJWTError, KeyError, TypeError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Snapshot of the user, served from the cache for repeated requests
+    user = user_cache.get(user_id, lambda uid: db.query(User).filter(User.id == uid).first())
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
-# Background task executor
-executor = ThreadPoolExecutor(max_workers=2)
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    return user_from_token(credentials.credentials, db)
 
-def process_video_sync(video_id: int, input_path: str, output_path: str):
-    """Process video in background thread"""
-    try:
-        # Import the video processor
-        from video_processor import process_video_file
-        
-        start_time = datetime.now()
-        
-        # Process the video
-        result = process_video_file(
-            input_path, 
-            output_path, 
-            trail_len=30, 
-            heatmap=True
-        )
-        
-        end_time = datetime.now()
-        processing_time = int((end_time - start_time).total_seconds())
-        
-        # Update database
-        db = SessionLocal()
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if video:
-            if result['success']:
-                video.status = "completed"
-                video.processing_time = processing_time
-            else:
-                video.status = "failed"
-            db.commit()
-        db.close()
-        
-    except Exception as e:
-        print(f"Error processing video {video_id}: {str(e)}")
-        db = SessionLocal()
-        video = db.query(Video).filter(Video.id == video_id).first()
-        if video:
-            video.status = "failed"
-            db.commit()
-        db.close()
+def require_ops_access(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    """Queue and worker internals: OPS_TOKEN when it is set, otherwise a logged-in user"""
+    if OPS_TOKEN:
+        if not hmac.compare_digest(credentials.credentials.encode(), OPS_TOKEN.encode()):
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        return
+    user_from_token(credentials.credentials, db)
+
+def get_stream_user(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+):
+    # EventSource cannot set headers, so streams also accept ?token=
+    if credentials is not None:
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_from_token(token, db)
+
+# Video jobs are persisted in the jobs table and run by separate worker
+# processes (see worker.py). JOB_WORKERS of them are started with the API;
+# set it to 0 and run `python worker.py` to process on other hosts.
+PROCESSING_PARAMS = {"trail_len": 30, "heatmap": True, "pipelined": True, "model_path": "yolov8n.pt"}
+worker_processes = []
+
+@app.on_event("startup")
+async def start_job_workers():
+    worker_processes.extend(start_workers(JOB_WORKERS))
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    stop_workers(worker_processes)
 
 # API Routes
 @app.post("/auth/register", response_model=UserResponse)
@@ -249,40 +269,38 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         created_at=current_user.created_at
     )
 
-@app.post("/videos/upload", response_model=VideoResponse)
-async def upload_video(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    # Validate file type
-    if not file.content_type.startswith('video/'):
-        raise HTTPException(status_code=400, detail="File must be a video")
-    
-    # Generate unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    input_path = f"uploads/{unique_filename}"
-    output_path = f"processed/{unique_filename}"
-    
-    # Save uploaded file
-    with open(input_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Create database record
+async def queue_upload(db: Session, upload: Upload, input_path: str) -> VideoResponse:
+    """
+    Create the video record for a finished upload and queue it for processing,
+    or link it straight to the cached output of an identical earlier upload
+    """
+    processed_filename = os.path.basename(input_path)
+    output_path = f"processed/{processed_filename}"
+    key = result_cache.cache_key(upload.content_hash, PROCESSING_PARAMS)
+    cached = result_cache.lookup(db, key)
+    if cached is not None:
+        await run_in_threadpool(result_cache.link_result, cached, output_path)
+
     db_video = Video(
-        user_id=current_user.id,
-        original_filename=file.filename,
-        processed_filename=unique_filename,
-        status="processing"
+        user_id=upload.user_id,
+        original_filename=upload.original_filename,
+        processed_filename=processed_filename,
+        status="completed" if cached is not None else "processing",
+        processing_time=0 if cached is not None else None
     )
     db.add(db_video)
     db.commit()
     db.refresh(db_video)
-    
-    # Start background processing
-    executor.submit(process_video_sync, db_video.id, input_path, output_path)
-    
+
+    upload.video_id = db_video.id
+    upload.status = "completed"
+    upload.updated_at = datetime.utcnow()
+    db.commit()
+
+    # Queue for background processing
+    if cached is None:
+        enqueue_job(db, db_video.id, input_path, output_path, params=PROCESSING_PARAMS, cache_key=key)
+
     return VideoResponse(
         id=db_video.id,
         original_filename=db_video.original_filename,
@@ -292,12 +310,180 @@ async def upload_video(
         processing_time=db_video.processing_time
     )
 
+def upload_response(upload: Upload) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=upload.id,
+        filename=upload.original_filename,
+        size=upload.total_size,
+        received=upload.received,
+        chunk_size=UPLOAD_CHUNK_SIZE,
+        status=upload.status
+    )
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Turn away bodies that declare more than the limit before any of it is read
+    length = request.headers.get("content-length", "")
+    if request.method in ("POST", "PUT") and length.isdigit() and int(length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds the {MAX_UPLOAD_SIZE} byte limit"})
+    return await call_next(request)
+
+@app.post("/videos/upload", response_model=VideoResponse)
+async def upload_video(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Validate file type
+    if not file.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+
+    upload = Upload(
+        id=new_upload_id(),
+        user_id=current_user.id,
+        original_filename=file.filename,
+        content_type=file.content_type
+    )
+
+    # Stream uploaded file to disk, hashing it on the way
+    part_path = partial_path(upload.id)
+    hasher = hashlib.sha256()
+    try:
+        upload.received = await stream_to_file(iter_upload_file(file), part_path, hasher)
+    except UploadTooLarge as e:
+        os.remove(part_path)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    input_path = f"uploads/{upload.id}{Path(file.filename).suffix}"
+    os.replace(part_path, input_path)
+    upload.total_size = upload.received
+    upload.content_hash = hasher.hexdigest()
+    db.add(upload)
+    return await queue_upload(db, upload, input_path)
+
+@app.post("/videos/uploads", response_model=UploadSessionResponse)
+async def create_upload(
+    session: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start a resumable upload, then PUT the file in chunks and POST .../complete"""
+    if not session.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    if session.size <= 0 or session.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"Upload size must be between 1 and {MAX_UPLOAD_SIZE} bytes")
+
+    upload = Upload(
+        id=new_upload_id(),
+        user_id=current_user.id,
+        original_filename=session.filename,
+        content_type=session.content_type,
+        total_size=session.size,
+        received=0
+    )
+    db.add(upload)
+    db.commit()
+    open(partial_path(upload.id), "wb").close()
+    return upload_response(upload)
+
+def get_upload_session(db: Session, upload_id: str, user: User) -> Upload:
+    upload = db.query(Upload).filter(Upload.id == upload_id, Upload.user_id == user.id).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+@app.get("/videos/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Upload progress; `received` is the offset to resume from"""
+    return upload_response(get_upload_session(db, upload_id, current_user))
+
+@app.put("/videos/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Append the raw request body at `offset`, which must equal the bytes received so far"""
+    upload = get_upload_session(db, upload_id, current_user)
+    if upload.status != "uploading":
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    if offset != upload.received:
+        raise HTTPException(status_code=409, detail=f"Expected offset {upload.received}")
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and offset + int(length) > upload.total_size:
+        raise HTTPException(status_code=413, detail="Chunk extends past the declared upload size")
+
+    hasher = await run_in_threadpool(resume_hasher, upload)
+    try:
+        written = await stream_to_file(request.stream(), partial_path(upload.id), hasher,
+                                       offset=offset, limit=upload.total_size)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="Chunk extends past the declared upload size")
+
+    upload.received = offset + written
+    upload.updated_at = datetime.utcnow()
+    db.commit()
+    remember_hasher(upload, hasher)
+    return upload_response(upload)
+
+@app.post("/videos/uploads/{upload_id}/complete", response_model=VideoResponse)
+async def complete_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload = get_upload_session(db, upload_id, current_user)
+    if upload.status != "uploading":
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    if upload.received != upload.total_size:
+        raise HTTPException(status_code=409, detail=f"Received {upload.received} of {upload.total_size} bytes")
+
+    upload.content_hash = await run_in_threadpool(finish_hash, upload)
+    input_path = f"uploads/{upload.id}{Path(upload.original_filename).suffix}"
+    os.replace(partial_path(upload.id), input_path)
+    return await queue_upload(db, upload, input_path)
+
+def encode_cursor(video: Video) -> str:
+    raw = json.dumps([video.created_at.isoformat(), video.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, video_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(video_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/videos", response_model=List[VideoResponse])
 async def get_user_videos(
+    response: Response,
+    limit: int = Query(VIDEO_PAGE_SIZE, ge=1, le=VIDEO_PAGE_MAX),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    videos = db.query(Video).filter(Video.user_id == current_user.id).order_by(Video.created_at.desc()).all()
+    """
+    The user's videos newest first, one page at a time. When more remain, the
+    X-Next-Cursor header (and a Link rel="next") holds the `cursor` for the next page.
+    """
+    # Keyset pagination on (created_at, id), an index range scan however deep the page
+    query = db.query(Video).filter(Video.user_id == current_user.id)
+    if cursor:
+        created_at, video_id = decode_cursor(cursor)
+        query = query.filter(or_(Video.created_at < created_at,
+                                 and_(Video.created_at == created_at, Video.id < video_id)))
+    videos = query.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1).all()
+    if len(videos) > limit:
+        videos = videos[:limit]
+        next_cursor = encode_cursor(videos[-1])
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'</videos?limit={limit}&cursor={next_cursor}>; rel="next"'
     return [
         VideoResponse(
             id=video.id,
@@ -309,6 +495,25 @@ async def get_user_videos(
         ) for video in videos
     ]
 
+@app.get("/videos/summary", response_model=VideoSummary)
+async def get_video_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Video counts by status, so the dashboard does not need every page of the list"""
+    counts = dict(
+        db.query(Video.status, func.count(Video.id))
+        .filter(Video.user_id == current_user.id)
+        .group_by(Video.status)
+        .all()
+    )
+    return VideoSummary(
+        total=sum(counts.values()),
+        completed=counts.get("completed", 0),
+        processing=counts.get("processing", 0),
+        failed=counts.get("failed", 0)
+    )
+
 @app.get("/videos/{video_id}", response_model=VideoResponse)
 async def get_video(
     video_id: int,
@@ -328,6 +533,69 @@ async def get_video(
         processing_time=video.processing_time
     )
 
+@app.get("/videos/{video_id}/events")
+async def video_events(
+    video_id: int,
+    current_user: User = Depends(get_stream_user),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events with status and progress (frames done, fps, ETA) until processing ends"""
+    video = db.query(Video).filter(Video.id == video_id, Video.user_id == current_user.id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    return StreamingResponse(
+        progress_broadcaster.stream(video_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/videos/{video_id}/render", response_model=VideoResponse)
+async def render_video(
+    video_id: int,
+    style: RenderRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Redraw a processed video's overlays with a new style from its stored tracks, without re-running detection"""
+    video = db.query(Video).filter(Video.id == video_id, Video.user_id == current_user.id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+    if video.status == "processing":
+        raise HTTPException(status_code=409, detail="Video is still processing")
+
+    output_path = f"processed/{video.processed_filename}"
+    input_path = f"uploads/{video.processed_filename}"
+    if not os.path.exists(tracks_path_for(output_path)) or not os.path.exists(input_path):
+        raise HTTPException(status_code=409, detail="No stored tracks for this video, it has to be processed again")
+
+    video.status = "processing"
+    db.commit()
+    enqueue_job(db, video.id, input_path, output_path, params=style.model_dump(), kind="render")
+
+    return VideoResponse(
+        id=video.id,
+        original_filename=video.original_filename,
+        processed_filename=video.processed_filename,
+        status=video.status,
+        created_at=video.created_at,
+        processing_time=video.processing_time
+    )
+
+@app.api_route("/processed/{name:path}", methods=["GET", "HEAD"])
+async def processed_media(name: str, request: Request):
+    """Processed videos, track files and HLS previews, with range requests and cache validators"""
+    return media_response(request, resolve_media_path("processed", name))
+
+@app.get("/jobs/status", dependencies=[Depends(require_ops_access)])
+async def jobs_status(db: Session = Depends(get_db)):
+    return dict(queue_stats(db), result_cache=result_cache.cache_stats(db), user_cache=user_cache.stats())
+
+@app.get("/metrics", dependencies=[Depends(require_ops_access)])
+async def metrics(db: Session = Depends(get_db)):
+    """Queue depth, worker utilization and per-stage pipeline timings in Prometheus text format"""
+    return Response(content=render_metrics(db), media_type=PrometheusText.CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"message": "Sports Video Analysis API", "status": "running"}
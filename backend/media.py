@@ -0,0 +1,126 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+# Media serving settings
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(256 * 1024)))
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "86400"))
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".npz": "application/octet-stream"
+}
+
+# Playlists grow while a video is processed and videos can be re-rendered in
+# place, so both are revalidated. HLS segments never change once listed.
+CACHE_CONTROL = {
+    ".m3u8": "no-cache",
+    ".ts": f"public, max-age={MEDIA_MAX_AGE}, immutable"
+}
+DEFAULT_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def resolve_media_path(root, name):
+    """Path of a file under root, 404 for anything missing or outside it"""
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+
+def parse_range(header, size):
+    """
+    Byte range requested by a Range header as (start, end) inclusive.
+
+    Returns None when the whole file should be sent (no header, a malformed or
+    multi-range header), raises 416 when the range lies outside the file.
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # Suffix range: the final N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def _iter_file(path, start, length, chunk_size=MEDIA_CHUNK_SIZE):
+    # Plain generator, StreamingResponse reads it from the threadpool
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def media_response(request, path):
+    """
+    Serve a file with byte range support and cache validators, so players can
+    seek into large videos and clients revalidate instead of downloading again.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    ext = os.path.splitext(path)[1].lower()
+    # Re-renders replace the file, which changes its inode and mtime
+    etag = f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": CACHE_CONTROL.get(ext, DEFAULT_CACHE_CONTROL)
+    }
+    media_type = MEDIA_TYPES.get(ext, "application/octet-stream")
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = parse_range(request.headers.get("range"), size)
+    # A stale If-Range means the client's partial copy is outdated: send it all
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range != etag:
+        byte_range = None
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_file(path, start, end - start + 1), status_code=status,
+                             headers=headers, media_type=media_type)
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
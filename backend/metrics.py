@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timedelta
+
+from job_queue import Worker, queue_stats, STALE_AFTER
+import result_cache
+from user_cache import user_cache
+from utils.metrics import PrometheusText, STAGES
+
+
+def render_metrics(db):
+    """
+    Prometheus exposition of the job queue, the live workers and their
+    pipeline timings, and the API's user cache.
+
+    Workers store running totals on their row after every job, so counters
+    are per worker and restart from zero with a new worker process.
+    """
+    stats = queue_stats(db)
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_AFTER)
+    workers = db.query(Worker).filter(Worker.heartbeat_at >= cutoff).order_by(Worker.id).all()
+    now = datetime.utcnow()
+    text = PrometheusText()
+
+    text.family("video_jobs", "gauge", "Jobs by status; queued is the queue depth",
+                [({'status': status}, count) for status, count in stats['jobs'].items()])
+    text.family("video_workers", "gauge", "Workers with a recent heartbeat", [({}, len(workers))])
+
+    uptime = {w.id: max((now - w.started_at).total_seconds(), 0.0) if w.started_at else 0.0 for w in workers}
+    text.family("video_worker_busy", "gauge", "1 while the worker runs a job",
+                [({'worker': w.id}, int(w.current_job_id is not None)) for w in workers])
+    text.family("video_worker_jobs_total", "counter", "Jobs the worker finished or failed",
+                [({'worker': w.id}, w.jobs_done or 0) for w in workers])
+    text.family("video_worker_busy_seconds_total", "counter", "Seconds the worker spent on finished jobs",
+                [({'worker': w.id}, float(w.busy_seconds or 0.0)) for w in workers])
+    text.family("video_worker_uptime_seconds", "gauge", "Seconds since the worker started",
+                [({'worker': w.id}, uptime[w.id]) for w in workers])
+    text.family("video_worker_utilization", "gauge", "Share of its uptime the worker spent on jobs",
+                [({'worker': w.id}, min((w.busy_seconds or 0.0) / uptime[w.id], 1.0) if uptime[w.id] else 0.0)
+                 for w in workers])
+    text.family("video_worker_model_load_seconds", "gauge", "Time the worker took to load and warm its model",
+                [({'worker': w.id}, float(w.model_load_time or 0.0)) for w in workers])
+
+    totals = [(w.id, json.loads(w.metrics)) for w in workers if w.metrics]
+    text.family("video_stage_seconds_total", "counter",
+                "Busy time per pipeline stage; stages overlap when pipelined",
+                [({'worker': wid, 'stage': stage}, float(m['stage_seconds'].get(stage, 0.0)))
+                 for wid, m in totals for stage in STAGES])
+    text.family("video_frames_total", "counter", "Frames written to output videos",
+                [({'worker': wid}, m['frames']) for wid, m in totals])
+    text.histogram("video_frame_latency_seconds", "Time from a frame being decoded to being encoded",
+                   [({'worker': wid}, m['frame_latency']) for wid, m in totals])
+    text.histogram("video_tracks_per_frame", "Tracks drawn per frame",
+                   [({'worker': wid}, m['tracks_per_frame']) for wid, m in totals])
+
+    cache = result_cache.cache_stats(db)
+    text.family("video_result_cache_entries", "gauge", "Processed results kept for duplicate uploads",
+                [({}, cache['entries'])])
+    text.family("video_result_cache_bytes", "gauge", "Bytes held by cached results", [({}, cache['bytes'])])
+    text.family("video_result_cache_hits_total", "counter", "Uploads served from a cached result",
+                [({}, cache['hits'])])
+
+    users = user_cache.stats()
+    text.family("video_user_cache_entries", "gauge", "Authenticated users cached by this API process",
+                [({}, users['entries'])])
+    text.family("video_user_cache_hits_total", "counter", "Authenticated requests served from the user cache",
+                [({}, users['hits'])])
+    text.family("video_user_cache_misses_total", "counter", "Authenticated requests that loaded the user",
+                [({}, users['misses'])])
+    text.family("video_user_cache_hit_ratio", "gauge", "Share of user lookups served from the cache",
+                [({}, users['hit_rate'])])
+    return text.render()
@@ -0,0 +1,110 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_MODEL = "yolov8n.pt"
+DEFAULT_REPLICAS = int(os.getenv("MODEL_REPLICAS", "1"))
+
+
+def load_yolo(model_path):
+    """Load YOLO weights; ultralytics and torch are only imported by the first call"""
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+
+class ModelPool:
+    """
+    Process-wide registry of warm YOLO models.
+
+    Each model path is loaded once per worker process into a fixed number of
+    replicas. A replica is handed out exclusively to one job at a time, since
+    YOLO predictors keep per-call state and are not safe to share between
+    threads.
+    """
+
+    def __init__(self, warmup_size=640):
+        self.warmup_size = warmup_size
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._stats = {}
+        self._loading = {}  # model path -> Event set once its load finished or failed
+
+    def _load_replica(self, model_path):
+        model = load_yolo(model_path)
+        # First inference builds the predictor and fuses layers, do it now
+        dummy = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+        model(dummy, verbose=False)
+        return model
+
+    def warmup(self, model_path=DEFAULT_MODEL, replicas=None):
+        """Load and warm up `replicas` instances of a model if not already loaded"""
+        replicas = replicas or DEFAULT_REPLICAS
+        while True:
+            with self._lock:
+                if model_path in self._pools:
+                    return self._stats[model_path]
+                loading = self._loading.get(model_path)
+                if loading is None:
+                    loading = self._loading[model_path] = threading.Event()
+                    break
+            # Another thread is loading this model, wait for it instead of loading it twice
+            loading.wait()
+
+        # Load without holding the lock, which would block stats() and other models for seconds
+        try:
+            start = time.perf_counter()
+            pool = queue.Queue()
+            for _ in range(replicas):
+                pool.put(self._load_replica(model_path))
+            load_time = time.perf_counter() - start
+
+            with self._lock:
+                self._pools[model_path] = pool
+                stats = self._stats[model_path] = {
+                    'model': model_path,
+                    'replicas': replicas,
+                    'load_time': load_time,
+                    'jobs_served': 0
+                }
+        finally:
+            with self._lock:
+                del self._loading[model_path]
+            loading.set()
+        print(f"Loaded {replicas} replica(s) of {model_path} in {load_time:.2f}s")
+        return stats
+
+    @contextmanager
+    def acquire(self, model_path=DEFAULT_MODEL, timeout=None):
+        """Borrow a warm model replica, blocking until one is free"""
+        with self._lock:
+            pool = self._pools.get(model_path)
+        if pool is None:
+            self.warmup(model_path)
+            with self._lock:
+                pool = self._pools[model_path]
+        try:
+            model = pool.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free replica of {model_path} after {timeout}s")
+        try:
+            yield model
+        finally:
+            pool.put(model)
+            with self._lock:
+                self._stats[model_path]['jobs_served'] += 1
+
+    def stats(self):
+        """Return load time, replica count and free replicas per model"""
+        with self._lock:
+            return [
+                dict(s, available=self._pools[path].qsize())
+                for path, s in self._stats.items()
+            ]
+
+
+# Shared instance for this worker process
+model_pool = ModelPool()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, BigInteger, func
+
+from database import Base
+from utils.tracks_io import tracks_path_for
+
+# Result cache settings
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "cache")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+
+
+class CachedResult(Base):
+    __tablename__ = "result_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of content hash + processing params
+    content_hash = Column(String(64), index=True)
+    params = Column(Text)  # JSON processing parameters the result was made with
+    path = Column(String)  # file under RESULT_CACHE_DIR
+    size_bytes = Column(BigInteger)  # output video plus its track file
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+# Processing options that only change how fast the same output is produced
+EXECUTION_PARAMS = ("pipelined", "queue_size", "batch_size")
+
+
+def cache_key(content_hash, params):
+    """Key a processed result by input content and everything that changes the output"""
+    params = {k: v for k, v in params.items() if k not in EXECUTION_PARAMS}
+    blob = json.dumps({"content": content_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _link(src, dest):
+    """Hard link src to dest (instant, no extra disk), copying across filesystems"""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def lookup(db, key):
+    """Cached result for key, marked as recently used, or None"""
+    entry = db.query(CachedResult).filter(CachedResult.key == key).first()
+    if entry is None:
+        return None
+    if not os.path.exists(entry.path):
+        db.delete(entry)
+        db.commit()
+        return None
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    db.commit()
+    return entry
+
+
+def link_result(entry, output_path):
+    """Make a cached result (and its track file) available at a video's own output path"""
+    _link(entry.path, output_path)
+    if os.path.exists(tracks_path_for(entry.path)):
+        _link(tracks_path_for(entry.path), tracks_path_for(output_path))
+
+
+def store(db, key, content_hash, params, output_path):
+    """Keep a freshly processed output in the cache, then evict down to the size limit"""
+    os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+    path = os.path.join(RESULT_CACHE_DIR, key + os.path.splitext(output_path)[1])
+    _link(output_path, path)
+    size = os.path.getsize(path)
+    if os.path.exists(tracks_path_for(output_path)):
+        _link(tracks_path_for(output_path), tracks_path_for(path))
+        size += os.path.getsize(tracks_path_for(path))
+    db.merge(CachedResult(
+        key=key,
+        content_hash=content_hash,
+        params=json.dumps(params, sort_keys=True),
+        path=path,
+        size_bytes=size,
+        hits=0,
+        created_at=datetime.utcnow(),
+        last_used_at=datetime.utcnow()
+    ))
+    db.commit()
+    return evict(db)
+
+
+def evict(db, max_bytes=RESULT_CACHE_MAX_BYTES):
+    """
+    Drop least recently used results until the cache fits in max_bytes.
+    Videos already linked to an evicted result keep their own link to it.
+
+    Returns:
+        int: number of results evicted
+    """
+    total = db.query(func.coalesce(func.sum(CachedResult.size_bytes), 0)).scalar()
+    evicted = 0
+    if total <= max_bytes:
+        return evicted
+    for entry in db.query(CachedResult).order_by(CachedResult.last_used_at).all():
+        if total <= max_bytes:
+            break
+        for path in (entry.path, tracks_path_for(entry.path)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= entry.size_bytes or 0
+        db.delete(entry)
+        evicted += 1
+    db.commit()
+    return evicted
+
+
+def cache_stats(db):
+    """Entry count, bytes held and hits served"""
+    count, size, hits = db.query(
+        func.count(CachedResult.key),
+        func.coalesce(func.sum(CachedResult.size_bytes), 0),
+        func.coalesce(func.sum(CachedResult.hits), 0)
+    ).one()
+    return {"entries": count, "bytes": size, "max_bytes": RESULT_CACHE_MAX_BYTES, "hits": hits}
@@ -0,0 +1,222 @@
+import atexit
+import multiprocessing
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+from model_pool import model_pool, DEFAULT_MODEL
+from video_processor import VideoProcessor, process_video_file, render_tracks, VIDEO_DECODER
+from utils.decoder import open_video
+from utils.metrics import PipelineMetrics
+from utils.progress import ProgressMeter
+from utils.stitching import stitch_segments
+
+# Segment-parallel settings
+SEGMENT_WORKERS = int(os.getenv("SEGMENT_WORKERS", "1"))
+SEGMENT_OVERLAP = int(os.getenv("SEGMENT_OVERLAP", "15"))
+MIN_SEGMENT_FRAMES = int(os.getenv("MIN_SEGMENT_FRAMES", "900"))
+
+
+def keyframe_indices(input_path, fps):
+    """Frame indices of the video's keyframes read from packet flags with ffprobe, None if unavailable"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", input_path
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=120).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    keyframes = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(int(round(float(pts) * fps)))
+    return np.unique(keyframes) if keyframes else None
+
+
+def plan_segments(total_frames, workers, overlap=SEGMENT_OVERLAP, keyframes=None,
+                  min_frames=MIN_SEGMENT_FRAMES):
+    """
+    Split a video into up to `workers` contiguous segments of at least `min_frames`.
+
+    A segment's tracker starts `overlap` frames before its first owned frame,
+    and that is where decoding has to seek to, so cuts are placed such that the
+    warm-up start falls on a keyframe when keyframes are known.
+
+    Returns:
+        list: (first owned frame, end frame) per segment, the last ends at None (end of video)
+    """
+    min_frames = max(min_frames, overlap + 1)
+    count = max(1, min(workers, total_frames // min_frames))
+    cuts = []
+    for i in range(1, count):
+        cut = round(i * total_frames / count)
+        if keyframes is not None:
+            pos = np.searchsorted(keyframes, cut - overlap)
+            nearby = keyframes[max(pos - 1, 0):pos + 1]
+            cut = int(nearby[np.argmin(np.abs(nearby - (cut - overlap)))]) + overlap
+        if cut - (cuts[-1] if cuts else 0) < min_frames or total_frames - cut < min_frames:
+            continue
+        cuts.append(cut)
+
+    bounds = [0] + cuts + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _init_segment_worker(threads, model_path):
+    """Give each segment process its share of the cores instead of all of them, and warm its model"""
+    import torch
+    import video_processor
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    if not video_processor.DECODE_THREADS:
+        video_processor.DECODE_THREADS = threads
+    model_pool.warmup(model_path, replicas=1)
+
+
+# Segment processes of this worker: (size, executor), kept across jobs
+_segment_pool = None
+
+
+def segment_pool(workers, model_path=DEFAULT_MODEL):
+    """
+    Process pool tracking segments, started on first use and reused by later
+    jobs, so every segment process loads and warms YOLO once instead of per
+    segment. Replaced when a job asks for a different number of workers.
+    """
+    global _segment_pool
+    if _segment_pool is not None and _segment_pool[0] != workers:
+        shutdown_segment_pool()
+    if _segment_pool is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        _segment_pool = (workers, ProcessPoolExecutor(max_workers=workers,
+                                                      mp_context=multiprocessing.get_context("spawn"),
+                                                      initializer=_init_segment_worker,
+                                                      initargs=(threads, model_path)))
+    return _segment_pool[1]
+
+
+def shutdown_segment_pool():
+    global _segment_pool
+    if _segment_pool is not None:
+        _segment_pool[1].shutdown(wait=True, cancel_futures=True)
+        _segment_pool = None
+
+
+atexit.register(shutdown_segment_pool)
+
+
+def _track_segment(input_path, start, end, model_path, track_kwargs):
+    """Detect and track one segment in a worker process"""
+    with model_pool.acquire(model_path) as model:
+        return VideoProcessor(model=model).track_range(input_path, start, end, **track_kwargs)
+
+
+def process_video_segments(input_path, output_path, model_path=DEFAULT_MODEL, workers=SEGMENT_WORKERS,
+                           overlap=SEGMENT_OVERLAP, trail_len=30, heatmap=False, pipelined=False,
+                           queue_size=8, progress=None, tracks_path=None, hls_dir=None, **track_kwargs):
+    """
+    Process a long video as segments tracked in parallel worker processes
+
+    Detection and tracking, the expensive part, runs per segment with its own
+    tracker. Track IDs are then stitched across segment boundaries and the
+    whole video is rendered and encoded in one pass, so burned-in IDs, trails
+    and the heatmap stay continuous. Falls back to process_video_file when the
+    video is too short to split.
+
+    Args:
+        workers (int): Number of segments tracked at once
+        overlap (int): Frames each segment tracks before its first owned frame,
+            shared with the previous segment and used to match track IDs
+        progress (callable): Receives ProgressMeter reports, per finished
+            segment while tracking, then per frame while rendering
+        tracks_path (str): Also save the stitched per-frame tracks here
+        hls_dir (str): Also write an HLS preview here while rendering
+        track_kwargs: batch_size, detect_every, motion_threshold, uncertainty_threshold
+
+    Returns:
+        dict: Processing results and statistics
+    """
+    kwargs = dict(track_kwargs, trail_len=trail_len, heatmap=heatmap, pipelined=pipelined,
+                  queue_size=queue_size, progress=progress, tracks_path=tracks_path, hls_dir=hls_dir)
+    if workers <= 1:
+        return process_video_file(input_path, output_path, model_path, **kwargs)
+
+    try:
+        with open_video(input_path, VIDEO_DECODER) as reader:
+            fps, total_frames = reader.fps, reader.frame_count
+
+        segments = plan_segments(total_frames, workers, overlap, keyframe_indices(input_path, fps))
+        if len(segments) == 1:
+            return process_video_file(input_path, output_path, model_path, **kwargs)
+
+        start_time = time.perf_counter()
+
+        # Track every segment in a warm worker process, each with a fresh tracker
+        pool = segment_pool(workers, model_path)
+        futures = [
+            pool.submit(_track_segment, input_path, max(0, owned - overlap), end, model_path, track_kwargs)
+            for owned, end in segments
+        ]
+        try:
+            meter = ProgressMeter(total_frames, progress, stage="tracking", interval=0)
+            for future in as_completed(futures):
+                meter.advance(len(future.result()['tracks']))
+            tracked = [f.result() for f in futures]
+        except BrokenProcessPool:
+            # A segment process died (e.g. out of memory), start fresh ones for the next job
+            shutdown_segment_pool()
+            raise
+        finally:
+            # Segments not started yet are not left to run for an aborted job
+            for future in futures:
+                future.cancel()
+        tracking_time = time.perf_counter() - start_time
+
+        for segment, (owned, _) in zip(tracked, segments):
+            segment['owned'] = owned
+        frame_tracks, carried = stitch_segments(tracked)
+
+        # Render and encode the stitched tracks
+        stats = render_tracks(input_path, output_path, frame_tracks, trail_len=trail_len, heatmap=heatmap,
+                              pipelined=pipelined, queue_size=queue_size, progress=progress,
+                              tracks_path=tracks_path, hls_dir=hls_dir)
+        processing_time = time.perf_counter() - start_time
+
+        drift = {k: sum(s['drift'][k] for s in tracked) for k in ('predicted', 'matched', 'iou_sum')}
+        # Decode, infer and track time spent in the segment processes, on top of rendering's
+        metrics = PipelineMetrics.from_dict(stats['metrics'])
+        for segment in tracked:
+            metrics.merge(segment['metrics'])
+        stats.update({
+            'total_frames': total_frames,
+            'processing_fps': stats['processed_frames'] / processing_time if processing_time > 0 else 0,
+            'processing_time': processing_time,
+            'tracking_time': tracking_time,
+            'segments': len(segments),
+            'segment_overlap': overlap,
+            'tracks_carried': carried,
+            'keyframes': sum(s['keyframes'] for s in tracked),
+            'keyframe_match_rate': drift['matched'] / drift['predicted'] if drift['predicted'] else 1.0,
+            'keyframe_match_iou': drift['iou_sum'] / drift['matched'] if drift['matched'] else 0.0,
+            'metrics': metrics.to_dict()
+        })
+
+        return {
+            'success': True,
+            'output_path': output_path,
+            'stats': stats
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from starlette.concurrency import run_in_threadpool
+
+from database import Base
+
+# Upload settings
+UPLOAD_DIR = "uploads"
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 ** 3)))  # bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 ** 2)))  # bytes per disk write
+UPLOAD_HASHERS = int(os.getenv("UPLOAD_HASHERS", "256"))  # running hashes kept for resumable uploads
+
+
+class Upload(Base):
+    __tablename__ = "uploads"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, also names the file on disk
+    user_id = Column(Integer, index=True)
+    original_filename = Column(String)
+    content_type = Column(String)
+    total_size = Column(BigInteger)  # declared size, None for single-request uploads
+    received = Column(BigInteger, default=0)
+    content_hash = Column(String(64), index=True)  # sha256 hex, set once complete
+    video_id = Column(Integer, index=True)
+    status = Column(String, default="uploading")  # uploading, completed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+# Running hash per resumable upload, valid while `received` matches its offset.
+# Lost on restart, when chunks land on another API process, or once evicted as
+# least recently used beyond UPLOAD_HASHERS (e.g. abandoned uploads); it is
+# then rebuilt from the partial file, see resume_hasher and finish_hash.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def new_upload_id():
+    return uuid.uuid4().hex
+
+
+def partial_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+
+def _open_at(path, offset):
+    buffer = open(path, "r+b" if offset else "wb")
+    if offset:
+        buffer.seek(offset)
+        buffer.truncate()
+    return buffer
+
+
+def _write_chunk(buffer, hasher, chunk):
+    buffer.write(chunk)
+    hasher.update(chunk)
+
+
+async def stream_to_file(chunks, path, hasher, offset=0, limit=MAX_UPLOAD_SIZE):
+    """
+    Append an async stream of byte chunks to path, hashing as it goes.
+    Opening, disk writes, hashing and closing run in the threadpool so the
+    event loop keeps serving other requests.
+
+    Returns:
+        int: bytes written
+    """
+    written = 0
+    pending = []
+    pending_size = 0
+    buffer = await run_in_threadpool(_open_at, path, offset)
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            written += len(chunk)
+            if offset + written > limit:
+                raise UploadTooLarge(f"Upload exceeds the {limit} byte limit")
+            # Coalesce small network reads into UPLOAD_CHUNK_SIZE disk writes
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= UPLOAD_CHUNK_SIZE:
+                await run_in_threadpool(_write_chunk, buffer, hasher, b"".join(pending))
+                pending, pending_size = [], 0
+        if pending:
+            await run_in_threadpool(_write_chunk, buffer, hasher, b"".join(pending))
+    finally:
+        await run_in_threadpool(buffer.close)
+    return written
+
+
+async def iter_upload_file(file):
+    """Read a multipart UploadFile in chunks"""
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def hash_file(path, size=None):
+    """sha256 of the first `size` bytes of a file (all of it by default), read in chunks"""
+    hasher = hashlib.sha256()
+    remaining = size
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(UPLOAD_CHUNK_SIZE if remaining is None else min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return hasher
+
+
+def resume_hasher(upload):
+    """
+    Running hash for the next chunk of a resumable upload, rebuilt from disk
+    if not cached. Returns a copy, so a chunk that fails half way does not
+    leave unacknowledged bytes in the cached state.
+    """
+    with _hashers_lock:
+        cached = _hashers.get(upload.id)
+    if cached is None or cached[0] != upload.received:
+        if upload.received:
+            hasher = hash_file(partial_path(upload.id), upload.received)
+        else:
+            hasher = hashlib.sha256()
+        cached = (upload.received, hasher)
+        remember_hasher(upload, hasher)
+    return cached[1].copy()
+
+
+def remember_hasher(upload, hasher):
+    """Cache the running hash for the upload's next chunk, evicting the least recently used"""
+    with _hashers_lock:
+        _hashers[upload.id] = (upload.received, hasher)
+        _hashers.move_to_end(upload.id)
+        while len(_hashers) > UPLOAD_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def finish_hash(upload):
+    """Final content hash of a fully received upload"""
+    with _hashers_lock:
+        hasher = _hashers.pop(upload.id, (None, None))
+    if hasher[0] == upload.received:
+        return hasher[1].hexdigest()
+    return hash_file(partial_path(upload.id), upload.received).hexdigest()
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from database import SessionLocal, User
+
+# Authenticated user cache settings
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # seconds, bounds staleness after outside changes
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+# Immutable copy of a user row. ORM instances are bound to the request's
+# session and expire when it commits, so they cannot be shared between requests.
+CachedUser = namedtuple("CachedUser", ["id", "email", "phone", "full_name", "is_active", "created_at"])
+
+
+def snapshot(user):
+    return CachedUser(user.id, user.email, user.phone, user.full_name, user.is_active, user.created_at)
+
+
+class UserCache:
+    """
+    Bounded TTL cache of users by id for authenticated requests, so status
+    polling does not cost a database round trip per request.
+
+    Entries are dropped as soon as a User is changed or deleted through the
+    ORM in this process (see the hooks below), otherwise after `ttl` seconds.
+    Bulk query.update() calls bypass the hooks and should call invalidate().
+    Least recently used entries are evicted beyond `max_size`.
+    """
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user id -> (expires at, CachedUser)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, load):
+        """Cached user, or load(user_id) -> User or None on a miss; None is not cached"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        user = load(user_id)
+        if user is None:
+            return None
+        cached = snapshot(user)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, cached)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or everyone without an id"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+user_cache = UserCache()
+
+
+# Invalidate when the change is flushed, and again once it commits, so a
+# request that reloaded the old row in between does not keep it for a full TTL
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_users", set()).add(target.id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _users_committed(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _users_rolled_back(session):
+    session.info.pop("changed_users", None)
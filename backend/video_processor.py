@@ -3,19 +3,364 @@ import numpy as np
 import subprocess
 import os
 import sys
+import threading
+import time
 from pathlib import Path
-from ultralytics import YOLO
-from utils.sort import Sort
-from utils.visualization import overlay_heatmap
-from utils.helpers import centroid_from_bbox, update_velocities
+from model_pool import model_pool, load_yolo, DEFAULT_MODEL
+from utils.sort import BatchSort
+from utils.pipeline import StagedPipeline
+from utils.keyframes import KeyframeScheduler
+from utils.visualization import HeatmapAccumulator, TrailStore, draw_trails, draw_boxes
+from utils.helpers import class_id_mask, extract_detections
+from utils.progress import ProgressMeter
+from utils.sort import iou_batch
+from utils.tracks_io import FrameTracks, TrackWriter, load_tracks
+from utils.encoder import FFmpegWriter, ffmpeg_available
+from utils.decoder import open_video
+from utils.metrics import PipelineMetrics
+
+# Tracker settings shared by every processing mode
+TRACKER_PARAMS = {'max_age': 8, 'min_hits': 1, 'iou_threshold': 0.3}
+
+# Overlay colors (BGR), overridable per render
+DEFAULT_COLORS = {
+    'person': (255, 0, 0),
+    'object': (0, 255, 255),
+    'trail': (0, 255, 0),
+    'velocity': (0, 0, 255),
+    'prediction': (0, 0, 255)
+}
+
+# Write track files with compressed members (smaller, but not memory-mappable)
+COMPRESS_TRACKS = os.getenv("COMPRESS_TRACKS", "0") == "1"
+
+# Length of HLS preview segments written while processing, 0 disables the preview
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+
+# Output encoder: ffmpeg, cv2 (mp4v), or auto = ffmpeg when it is installed
+VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "auto")
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+ENCODER_SETTINGS = {
+    'codec': os.getenv("ENCODER_CODEC", "libx264"),
+    'crf': int(os.getenv("ENCODER_CRF", "23")),
+    'preset': os.getenv("ENCODER_PRESET", "veryfast"),
+    'threads': int(os.getenv("ENCODER_THREADS", "0"))  # 0 = ffmpeg decides
+}
+
+# Input decoder: pyav, opencv, or auto = PyAV when it is installed
+VIDEO_DECODER = os.getenv("VIDEO_DECODER", "auto")
+DECODE_THREADS = int(os.getenv("DECODE_THREADS", "0"))  # 0 = one per core (PyAV)
+# Longest side of the frames YOLO sees, downscaled while decoding; 0 = full size
+INFERENCE_SIZE = int(os.getenv("INFERENCE_SIZE", "0"))
+
+def open_video_writer(output_path, fps, width, height, hls_dir=None, encoder=VIDEO_ENCODER):
+    """
+    Writer for the output video, also feeding an HLS preview in hls_dir when
+    given. output_path may be None when only the HLS stream is wanted.
+
+    The preview needs ffmpeg: OpenCV can only write MPEG-4 Part 2, which HLS
+    players do not decode, so without ffmpeg no preview is written at all.
+    """
+    if not hls_dir or HLS_SEGMENT_SECONDS <= 0:
+        hls_dir = None
+    if encoder == "ffmpeg" or (encoder == "auto" and ffmpeg_available(FFMPEG_BIN)):
+        return FFmpegWriter(output_path, fps, (width, height), hls_dir=hls_dir, hls_time=HLS_SEGMENT_SECONDS,
+                            ffmpeg=FFMPEG_BIN, **ENCODER_SETTINGS)
+
+    if output_path is None:
+        raise RuntimeError("HLS output needs ffmpeg")
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+def close_video_writer(out, output_path=None, failed=False):
+    """
+    Flush and close a writer from open_video_writer. After a failure the
+    encoder is stopped without flushing and the partial output_path removed.
+    """
+    if not failed:
+        out.release()
+        return
+    try:
+        getattr(out, "abort", out.release)()
+    except Exception as e:
+        print(f"Closing the encoder of {output_path} failed: {str(e)}")
+    if output_path and os.path.exists(output_path):
+        os.remove(output_path)
+
+class OverlayRenderer:
+    """
+    Draws trails, velocities, ball predictions, boxes and the heatmap for
+    tracked objects, frame by frame, and counts players and ball detections.
+    Only needs tracks, so it can render from a live tracker or stored tracks.
+    """
+
+    def __init__(self, width, height, fps, trail_len=30, heatmap=False,
+                 expire_after=TRACKER_PARAMS['max_age'] + 1, colors=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.heatmap = heatmap
+        self.trails = TrailStore(trail_len, expire_after=expire_after)
+        self.velocities = {}
+        self.heatmap_accum = HeatmapAccumulator(width, height)
+        self.players_detected = set()
+        self.ball_detections = 0
+        self.colors = dict(DEFAULT_COLORS)
+        self.colors.update({name: tuple(int(c) for c in color) for name, color in (colors or {}).items()})
+
+    def render(self, frame, tracked, labels, detected=True):
+        """Annotate one frame in place: draw(), then blend_heatmap()"""
+        return self.blend_heatmap(self.draw(frame, tracked, labels, detected))
+
+    def draw(self, frame, tracked, labels, detected=True):
+        """
+        Draw one frame's tracks in place and accumulate them into the stats and heatmap.
+
+        Args:
+            frame (ndarray): Decoded BGR frame
+            tracked (ndarray): (N,5) array of [x1,y1,x2,y2,id]
+            labels (list): Class name per track
+            detected (bool): Whether YOLO ran on this frame, stats only count those
+        """
+        trails, velocities, colors = self.trails, self.velocities, self.colors
+        width, height = self.width, self.height
+
+        # Process tracked objects, drawing straight into the decoded frame
+        vis_frame = frame
+        tracked = np.asarray(tracked).reshape(-1, 5)
+        boxes = tracked[:, :4].astype(int)
+        tids = tracked[:, 4].astype(int)
+        cxs = boxes[:, 0] + (tracked[:, 2] - tracked[:, 0]).astype(int) // 2
+        cys = boxes[:, 1] + (tracked[:, 3] - tracked[:, 1]).astype(int) // 2
+        trails.next_frame()
+        trails.append_many(tids, cxs, cys)
+
+        is_person = np.zeros(len(tids), dtype=bool)
+        for i, (tid, cx, cy, label) in enumerate(zip(tids.tolist(), cxs.tolist(), cys.tolist(), labels)):
+            x1, y1 = int(boxes[i, 0]), int(boxes[i, 1])
+            is_person[i] = label == "person"
+
+            # Update velocities
+            velocities[tid] = trails.velocity(tid, self.fps)
+
+            # Update statistics
+            if detected and label == "person":
+                self.players_detected.add(tid)
+            elif detected and label == "sports ball":
+                self.ball_detections += 1
+
+            # Heatmap accumulation
+            if self.heatmap:
+                self.heatmap_accum.add(cx, cy)
+
+            # Draw velocity text
+            vx, vy = velocities[tid]
+            cv2.putText(vis_frame, f"v=({vx:.1f},{vy:.1f})", (cx, cy - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, colors['velocity'], 2)
+
+            # Ball trajectory prediction
+            if label == "sports ball":
+                for step in range(1, 20):  # predict 20 frames ahead
+                    fx, fy = int(cx + vx * step), int(cy + vy * step)
+                    if 0 <= fx < width and 0 <= fy < height:
+                        cv2.circle(vis_frame, (fx, fy), 2, colors['prediction'], -1)
+
+            # Draw label
+            color = colors['person'] if label == "person" else colors['object']
+            cv2.putText(vis_frame, f"{label} ID{tid}", (x1, y1 - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        # Draw all trajectory trails and bounding boxes in batched calls
+        draw_trails(vis_frame, trails, tids.tolist(), colors['trail'], 2)
+        draw_boxes(vis_frame, boxes[is_person], colors['person'], 2)
+        draw_boxes(vis_frame, boxes[~is_person], colors['object'], 2)
+
+        return vis_frame
+
+    def blend_heatmap(self, frame):
+        """Overlay the heatmap if enabled"""
+        if self.heatmap:
+            frame = self.heatmap_accum.overlay(frame, alpha=0.45)
+        return frame
+
+    def velocity_array(self, tracked):
+        """Velocities of the tracks just rendered, as an (N,2) array in track order"""
+        return np.array([self.velocities[tid] for tid in tracked[:, 4].astype(int).tolist()],
+                        dtype=np.float32).reshape(-1, 2)
 
 class VideoProcessor:
-    def __init__(self, model_path="yolov8n.pt"):
-        """Initialize the video processor with YOLO model"""
-        self.model = YOLO(model_path)
+    def __init__(self, model_path=DEFAULT_MODEL, model=None, decoder=VIDEO_DECODER,
+                 inference_size=INFERENCE_SIZE):
+        """Initialize the video processor with YOLO model (or an already warm one)"""
+        self.model = model if model is not None else load_yolo(model_path)
+        self.decoder = decoder
+        self.inference_size = inference_size
         self.allowed_classes = {"person", "sports ball"}
+        self.class_mask = class_id_mask(self.model.names, self.allowed_classes)
+        self._model_lock = threading.Lock()
         
-    def process_video(self, input_path, output_path, trail_len=30, heatmap=False):
+    def _open_video(self, input_path):
+        return open_video(input_path, self.decoder, DECODE_THREADS, self.inference_size)
+
+    def _infer(self, frames):
+        """Run one YOLO inference call over a batch of frames"""
+        with self._model_lock:
+            return self.model(frames, verbose=False)
+
+    def _infer_keyframes(self, frames, scheduler):
+        """Run YOLO over the keyframes of a batch, None for frames left to the tracker"""
+        # Downscaled copies made by the decoder, when it was asked for them
+        frames = getattr(frames, 'inference_frames', None) or frames
+        if scheduler.every_frame:
+            return self._infer(frames)
+        keys = [i for i, frame in enumerate(frames) if scheduler.is_keyframe(frame)]
+        results = [None] * len(frames)
+        if keys:
+            for i, r in zip(keys, self._infer([frames[i] for i in keys])):
+                results[i] = r
+        return results
+
+    def _track_frame(self, frame, results, tracker, state):
+        """
+        Update the tracker with one frame's YOLO results.
+        results is None on frames skipped by the keyframe scheduler; tracks are
+        then carried forward on the Kalman prediction alone.
+
+        Returns:
+            FrameTracks: (N,5) array of [x1,y1,x2,y2,id], class label and detection
+                confidence per track, whether YOLO ran
+        """
+        stats, labels, metrics = state['stats'], state['labels'], state['metrics']
+
+        # Coasting tracks got too uncertain, detect on this frame after all
+        if results is None and state['scheduler'].needs_refresh(tracker):
+            with metrics.stage('infer'):
+                results = self._infer([state['reader'].resize_for_inference(frame)])[0]
+
+        start = time.perf_counter()
+        detected = results is not None
+        if detected:
+            # Extract allowed detections as one (N,6) array
+            detections = extract_detections(results, self.class_mask)
+            scale = state['reader'].inference_scale
+            if scale is not None and len(detections):
+                # Back from inference to full frame pixels
+                detections[:, :4] = np.trunc(detections[:, :4] * np.tile(scale, 2))
+            names = self.model.names
+            cls_map = {
+                tuple(box): names[cls_id]
+                for box, cls_id in zip(detections[:, :4].astype(int).tolist(),
+                                       detections[:, 5].astype(int).tolist())
+            }
+
+            # Update tracker
+            if len(detections) > 0:
+                tracked = tracker.update(detections)
+                drift = state['drift']
+                drift['predicted'] += tracker.last_predicted
+                drift['matched'] += len(tracker.last_match_iou)
+                drift['iou_sum'] += float(tracker.last_match_iou.sum())
+            else:
+                tracked = []
+            stats['keyframes'] += 1
+        else:
+            tracked = tracker.coast()
+
+        tracked = np.asarray(tracked).reshape(-1, 5)
+        tids = tracked[:, 4].astype(int).tolist()
+
+        # Save class names of freshly detected tracks, coasting ones keep theirs
+        confidence = np.full(len(tracked), np.nan, dtype=np.float32)
+        if detected:
+            for box, tid in zip(tracked[:, :4].astype(int).tolist(), tids):
+                labels[tid] = cls_map.get(tuple(box), "object")
+            # Confidence of the detection each track overlaps most
+            if len(tracked) and len(detections):
+                iou = iou_batch(tracked[:, :4], detections[:, :4])
+                best = iou.argmax(axis=1)
+                hit = iou[np.arange(len(tracked)), best] > 0
+                confidence[hit] = detections[best[hit], 4]
+        metrics.add('track', time.perf_counter() - start)
+        return FrameTracks(tracked, [labels.get(tid, "object") for tid in tids], confidence, detected)
+
+    def _process_frame(self, frame, results, tracker, state):
+        """Track, annotate and accumulate stats for one frame given its YOLO results"""
+        frame_tracks = self._track_frame(frame, results, tracker, state)
+        renderer, metrics = state['renderer'], state['metrics']
+        with metrics.stage('draw'):
+            vis_frame = renderer.draw(frame, frame_tracks.tracks, frame_tracks.labels, frame_tracks.detected)
+        with metrics.stage('heatmap'):
+            vis_frame = renderer.blend_heatmap(vis_frame)
+        metrics.tracks_per_frame.observe(len(frame_tracks.tracks))
+        if state['track_writer'] is not None:
+            state['track_writer'].append(frame_tracks, renderer.velocity_array(frame_tracks.tracks))
+        return vis_frame
+
+    def track_range(self, input_path, start=0, end=None, batch_size=1, detect_every=1,
+                    motion_threshold=None, uncertainty_threshold=None, progress=None):
+        """
+        Detect and track frames [start, end) of a video without rendering anything
+
+        Args:
+            input_path (str): Path to input video
+            start (int): First frame to track
+            end (int): Frame to stop before, None for end of video
+            progress (callable): Receives ProgressMeter reports while tracking
+
+        Returns:
+            dict: per-frame FrameTracks as returned by _track_frame plus
+                keyframe and drift counters and stage timings
+        """
+        reader = self._open_video(input_path)
+        if start:
+            reader.seek(start)
+
+        total_frames = reader.frame_count
+        meter = ProgressMeter((end if end is not None else total_frames) - start, progress, stage="tracking")
+        tracker = BatchSort(**TRACKER_PARAMS)
+        metrics = PipelineMetrics()
+        state = {
+            'reader': reader,
+            'stats': {'keyframes': 0},
+            'labels': {},
+            'scheduler': KeyframeScheduler(detect_every, motion_threshold, uncertainty_threshold),
+            'drift': {'predicted': 0, 'matched': 0, 'iou_sum': 0.0},
+            'metrics': metrics
+        }
+
+        frames = []
+        try:
+            while end is None or start + len(frames) < end:
+                want = batch_size if end is None else min(batch_size, end - start - len(frames))
+                with metrics.stage('decode'):
+                    batch = reader.read_batch(want)
+                if not batch:
+                    break
+
+                with metrics.stage('infer'):
+                    batch_results = self._infer_keyframes(batch, state['scheduler'])
+                for frame, results in zip(batch, batch_results):
+                    frame_tracks = self._track_frame(frame, results, tracker, state)
+                    frames.append(frame_tracks)
+                meter.advance(len(batch))
+
+                if len(batch) < want:
+                    break
+        finally:
+            reader.release()
+        meter.finish()
+
+        return {
+            'start': start,
+            'tracks': frames,
+            'keyframes': state['stats']['keyframes'],
+            'drift': state['drift'],
+            'metrics': metrics.to_dict()
+        }
+
+    def process_video(self, input_path, output_path, trail_len=30, heatmap=False, batch_size=1,
+                      pipelined=False, queue_size=8, detect_every=1, motion_threshold=None,
+                      uncertainty_threshold=None, progress=None, tracks_path=None, hls_dir=None):
         """
         Process video with YOLO tracking and ball trajectory prediction
         
@@ -24,30 +369,43 @@ class VideoProcessor:
             output_path (str): Path to save processed video
             trail_len (int): Length of trajectory trails
             heatmap (bool): Whether to overlay heatmap
+            batch_size (int): Number of frames decoded and sent to YOLO per inference call
+            pipelined (bool): Run decode, inference and encode on separate threads
+            queue_size (int): Capacity of each inter-stage queue when pipelined
+            detect_every (int): Run YOLO on every Nth frame and interpolate tracks in between
+            motion_threshold (float): Also detect when the scene changes by more than this
+                mean grey-level difference since the last keyframe
+            uncertainty_threshold (float): Also detect when a track's positional
+                uncertainty exceeds this many pixels
+            progress (callable): Receives {stage, frames_done, total_frames, fps, eta}
+                about once a second
+            tracks_path (str): Also save per-frame tracks here (see utils.tracks_io)
+            hls_dir (str): Also write an HLS preview here that can be played
+                while processing is still running (see utils.hls)
             
         Returns:
             dict: Processing results and statistics
         """
+        reader = out = None
+        failed = True
         try:
+            if batch_size < 1:
+                raise ValueError(f"batch_size must be >= 1, got {batch_size}")
+
             # Open input video
-            cap = cv2.VideoCapture(input_path)
-            if not cap.isOpened():
-                raise ValueError(f"Cannot open video: {input_path}")
+            reader = self._open_video(input_path)
 
             # Get video properties
-            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = reader.fps
+            width = reader.width
+            height = reader.height
+            total_frames = reader.frame_count
             
             # Setup output video writer
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            out = open_video_writer(output_path, fps, width, height, hls_dir)
 
             # Initialize tracker and buffers
-            tracker = Sort(max_age=8, min_hits=1, iou_threshold=0.3)
-            trails, velocities, labels = {}, {}, {}
-            heatmap_accum = np.zeros((height, width), dtype=np.float32)
+            tracker = BatchSort(**TRACKER_PARAMS)
             
             # Processing statistics
             stats = {
@@ -55,111 +413,98 @@ class VideoProcessor:
                 'processed_frames': 0,
                 'players_detected': set(),
                 'ball_detections': 0,
-                'processing_fps': 0
+                'processing_fps': 0,
+                'batch_size': batch_size,
+                'detect_every': detect_every,
+                'keyframes': 0
+            }
+
+            metrics = PipelineMetrics()
+            state = {
+                'reader': reader,
+                'stats': stats,
+                'renderer': OverlayRenderer(width, height, fps, trail_len, heatmap,
+                                            expire_after=tracker.max_age + 1),
+                'track_writer': TrackWriter() if tracks_path else None,
+                'labels': {},
+                'scheduler': KeyframeScheduler(detect_every, motion_threshold, uncertainty_threshold),
+                'drift': {'predicted': 0, 'matched': 0, 'iou_sum': 0.0},
+                'metrics': metrics
             }
             
+            def read_batch():
+                # Decode up to batch_size frames
+                with metrics.stage('decode'):
+                    batch = reader.read_batch(batch_size)
+                metrics.decoded(len(batch))
+                return batch
+
+            def infer(batch):
+                with metrics.stage('infer'):
+                    return self._infer_keyframes(batch, state['scheduler'])
+
+            meter = ProgressMeter(total_frames, progress)
+
+            def process(frame, results):
+                vis_frame = self._process_frame(frame, results, tracker, state)
+                meter.advance()
+                return vis_frame
+
+            def write(frame):
+                with metrics.stage('encode'):
+                    out.write(frame)
+                metrics.encoded()
+
             frame_count = 0
             start_time = cv2.getTickCount()
 
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            if pipelined:
+                pipeline = StagedPipeline(queue_size=queue_size)
+                frame_count = pipeline.run(read_batch, infer, process, write)
+                stats['queue_occupancy'] = pipeline.occupancy()
+            else:
+                while True:
+                    batch = read_batch()
+                    if not batch:
+                        break
 
-                # Run YOLO inference
-                results = self.model(frame, verbose=False)[0]
-                detections = []
-                cls_map = {}
-
-                # Process detections
-                for box in results.boxes:
-                    cls_id = int(box.cls[0])
-                    cls_name = self.model.names[cls_id]
-                    
-                    if cls_name in self.allowed_classes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                        conf = float(box.conf[0])
-                        detections.append([x1, y1, x2, y2, conf])
-                        cls_map[(x1, y1, x2, y2)] = cls_name
-
-                detections = np.array(detections)
-                
-                # Update tracker
-                if len(detections) > 0:
-                    tracked = tracker.update(detections)
-                else:
-                    tracked = []
-
-                # Process tracked objects
-                vis_frame = frame.copy()
-                for x1, y1, x2, y2, tid in tracked:
-                    tid = int(tid)
-                    cx, cy = centroid_from_bbox((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
-
-                    # Save class name
-                    bbox_key = (int(x1), int(y1), int(x2), int(y2))
-                    label = cls_map.get(bbox_key, "object")
-                    labels[tid] = label
-
-                    # Update trails
-                    trails.setdefault(tid, []).append((cx, cy))
-                    trails[tid] = trails[tid][-trail_len:]
-
-                    # Update velocities
-                    velocities[tid] = update_velocities(trails[tid], fps)
-
-                    # Update statistics
-                    if label == "person":
-                        stats['players_detected'].add(tid)
-                    elif label == "sports ball":
-                        stats['ball_detections'] += 1
-
-                    # Heatmap accumulation
-                    if heatmap:
-                        heatmap_accum[cy, cx] += 1
-
-                    # Draw trajectory trails
-                    for i in range(1, len(trails[tid])):
-                        cv2.line(vis_frame, trails[tid][i - 1], trails[tid][i], (0, 255, 0), 2)
-
-                    # Draw velocity text
-                    vx, vy = velocities[tid]
-                    cv2.putText(vis_frame, f"v=({vx:.1f},{vy:.1f})", (cx, cy - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-                    # Ball trajectory prediction
-                    if label == "sports ball":
-                        for step in range(1, 20):  # predict 20 frames ahead
-                            fx, fy = int(cx + vx * step), int(cy + vy * step)
-                            if 0 <= fx < width and 0 <= fy < height:
-                                cv2.circle(vis_frame, (fx, fy), 2, (0, 0, 255), -1)
-
-                    # Draw bounding box and label
-                    color = (255, 0, 0) if label == "person" else (0, 255, 255)
-                    cv2.rectangle(vis_frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                    cv2.putText(vis_frame, f"{label} ID{tid}", (int(x1), int(y1) - 5),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                # Overlay heatmap if enabled
-                if heatmap:
-                    vis_frame = overlay_heatmap(vis_frame, heatmap_accum, alpha=0.45)
-
-                # Write frame to output video
-                out.write(vis_frame)
-                frame_count += 1
+                    # Run YOLO inference once for the whole batch, then track in frame order
+                    for frame, results in zip(batch, infer(batch)):
+                        # Write frame to output video
+                        write(process(frame, results))
+                        frame_count += 1
+
+                    if len(batch) < batch_size:
+                        break
+
+            meter.finish()
+            if tracks_path:
+                state['track_writer'].save(tracks_path, fps, width, height, compress=COMPRESS_TRACKS)
 
             # Calculate final statistics
             end_time = cv2.getTickCount()
             processing_time = (end_time - start_time) / cv2.getTickFrequency()
             stats['processed_frames'] = frame_count
             stats['processing_fps'] = frame_count / processing_time if processing_time > 0 else 0
-            stats['players_detected'] = len(stats['players_detected'])
+            stats['players_detected'] = len(state['renderer'].players_detected)
+            stats['ball_detections'] = state['renderer'].ball_detections
             stats['processing_time'] = processing_time
 
-            # Cleanup
-            cap.release()
-            out.release()
-            cv2.destroyAllWindows()
+            # Accuracy cost of interpolation: how well Kalman predictions still
+            # overlap fresh detections at keyframes
+            drift = state['drift']
+            stats['interpolated_frames'] = frame_count - stats['keyframes']
+            stats['keyframe_match_rate'] = drift['matched'] / drift['predicted'] if drift['predicted'] else 1.0
+            stats['keyframe_match_iou'] = drift['iou_sum'] / drift['matched'] if drift['matched'] else 0.0
+
+            # Cleanup, flushing the encoder counts towards encode
+            reader.release()
+            reader = None
+            with metrics.stage('encode'):
+                out.release()
+            out = None
+            failed = False
+            stats['metrics'] = metrics.to_dict()
 
             return {
                 'success': True,
@@ -172,11 +517,139 @@ class VideoProcessor:
                 'success': False,
                 'error': str(e)
             }
+        finally:
+            # Only reached with open handles when processing failed part way
+            if reader is not None:
+                reader.release()
+            if out is not None:
+                close_video_writer(out, output_path, failed)
+
+def render_tracks(input_path, output_path, frame_tracks, trail_len=30, heatmap=False,
+                  pipelined=False, queue_size=8, batch_size=8, progress=None, tracks_path=None,
+                  colors=None, hls_dir=None):
+    """
+    Re-decode a video and draw already computed tracks on it, no detection
+
+    Args:
+        input_path (str): Path to input video
+        output_path (str): Path to save processed video
+        frame_tracks (list): One FrameTracks per frame, frames past the end of
+            the list are written without annotations
+        progress (callable): Receives ProgressMeter reports while rendering
+        tracks_path (str): Also save the tracks with their velocities here
+        colors (dict): Overlay colors overriding DEFAULT_COLORS, by element name
+        hls_dir (str): Also write an HLS preview here while rendering
+
+    Returns:
+        dict: Rendering statistics
+    """
+    reader = open_video(input_path, VIDEO_DECODER, DECODE_THREADS)
+    fps, width, height = reader.fps, reader.width, reader.height
+    out = open_video_writer(output_path, fps, width, height, hls_dir)
+    renderer = OverlayRenderer(width, height, fps, trail_len, heatmap, colors=colors)
+    meter = ProgressMeter(reader.frame_count, progress, stage="rendering")
+    writer = TrackWriter() if tracks_path else None
+    no_tracks = FrameTracks(np.empty((0, 5)), [], np.empty(0, dtype=np.float32), False)
+    metrics = PipelineMetrics()
+    cursor = [0]
+
+    def read_batch():
+        with metrics.stage('decode'):
+            batch = reader.read_batch(batch_size)
+        metrics.decoded(len(batch))
+        return batch
+
+    def lookup(batch):
+        # Stands in for inference: hand out the stored tracks of each frame in order
+        first = cursor[0]
+        cursor[0] += len(batch)
+        return [frame_tracks[i] if i < len(frame_tracks) else no_tracks
+                for i in range(first, first + len(batch))]
+
+    def process(frame, tracks):
+        with metrics.stage('draw'):
+            vis_frame = renderer.draw(frame, tracks.tracks, tracks.labels, tracks.detected)
+        with metrics.stage('heatmap'):
+            vis_frame = renderer.blend_heatmap(vis_frame)
+        metrics.tracks_per_frame.observe(len(tracks.tracks))
+        if writer is not None:
+            writer.append(tracks, renderer.velocity_array(tracks.tracks))
+        meter.advance()
+        return vis_frame
+
+    def write(frame):
+        with metrics.stage('encode'):
+            out.write(frame)
+        metrics.encoded()
+
+    failed = True
+    try:
+        if pipelined:
+            frame_count = StagedPipeline(queue_size=queue_size).run(read_batch, lookup, process, write)
+        else:
+            frame_count = 0
+            while True:
+                batch = read_batch()
+                if not batch:
+                    break
+                for frame, tracks in zip(batch, lookup(batch)):
+                    write(process(frame, tracks))
+                    frame_count += 1
+        failed = False
+    finally:
+        reader.release()
+        with metrics.stage('encode'):
+            close_video_writer(out, output_path, failed)
+    meter.finish()
+    if writer is not None:
+        writer.save(tracks_path, fps, width, height, compress=COMPRESS_TRACKS)
+
+    return {
+        'processed_frames': frame_count,
+        'players_detected': len(renderer.players_detected),
+        'ball_detections': renderer.ball_detections,
+        'metrics': metrics.to_dict()
+    }
+
+def rerender_video(input_path, output_path, tracks_path, trail_len=30, heatmap=False, colors=None,
+                   pipelined=False, progress=None):
+    """
+    Redraw overlays from a saved track file onto the decoded input video,
+    skipping detection and tracking. The new video replaces output_path only
+    once fully written, so a failed render leaves the old one in place.
+    """
+    try:
+        start_time = time.perf_counter()
+        tracks = load_tracks(tracks_path)
+        base, ext = os.path.splitext(output_path)
+        tmp_path = f"{base}.rendering{ext}"
+        try:
+            stats = render_tracks(input_path, tmp_path, tracks, trail_len=trail_len, heatmap=heatmap,
+                                  pipelined=pipelined, progress=progress, colors=colors)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        stats['processing_time'] = time.perf_counter() - start_time
+        stats['processing_fps'] = stats['processed_frames'] / stats['processing_time'] if stats['processing_time'] > 0 else 0
+        return {
+            'success': True,
+            'output_path': output_path,
+            'stats': stats
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
 
-def process_video_file(input_path, output_path, **kwargs):
-    """Convenience function to process a video file"""
-    processor = VideoProcessor()
-    return processor.process_video(input_path, output_path, **kwargs)
+def process_video_file(input_path, output_path, model_path=DEFAULT_MODEL, **kwargs):
+    """Convenience function to process a video file with a pooled warm model"""
+    with model_pool.acquire(model_path) as model:
+        processor = VideoProcessor(model=model)
+        return processor.process_video(input_path, output_path, **kwargs)
 
 if __name__ == "__main__":
     # Test the processor
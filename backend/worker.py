@@ -0,0 +1,228 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import result_cache
+from database import init_db, SessionLocal
+from job_queue import (
+    Worker, worker_identity, claim_job, heartbeat, update_progress, complete_job, fail_job, requeue_stale,
+    HEARTBEAT_INTERVAL, STALE_AFTER
+)
+from uploads import Upload
+from utils.hls import PLAYLIST_NAME, hls_dir_for
+from utils.metrics import PipelineMetrics
+from utils.tracks_io import tracks_path_for
+
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+
+def _touch_worker(worker_id, **fields):
+    db = SessionLocal()
+    try:
+        fields["heartbeat_at"] = datetime.utcnow()
+        db.query(Worker).filter(Worker.id == worker_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobLost(Exception):
+    """The job was requeued and possibly claimed by another worker while this one ran it"""
+
+
+def _heartbeat_loop(stop, lost, job_id, worker_id):
+    """Keep the claimed job (and this worker) alive while it is processed, sets lost if it was taken away"""
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        db = SessionLocal()
+        try:
+            if not heartbeat(db, job_id, worker_id):
+                print(f"Job {job_id} was taken away from worker {worker_id}, stopping")
+                lost.set()
+        except Exception as e:
+            print(f"Heartbeat for job {job_id} failed: {str(e)}")
+        finally:
+            db.close()
+        _touch_worker(worker_id)
+
+
+def _progress_reporter(job_id, hls_dir=None, lost=None):
+    """
+    Progress callback that stores the latest report on the job for API streams.
+    Raises JobLost once `lost` is set, which aborts the pipeline it is called from.
+    """
+    playlist = os.path.join(hls_dir, PLAYLIST_NAME) if hls_dir else None
+
+    def report(progress):
+        if lost is not None and lost.is_set():
+            raise JobLost(f"job {job_id} was taken away")
+        if playlist and os.path.exists(playlist):
+            progress = dict(progress, preview_url="/" + playlist.replace(os.sep, "/"))
+        db = SessionLocal()
+        try:
+            update_progress(db, job_id, progress)
+        except Exception as e:
+            print(f"Progress update for job {job_id} failed: {str(e)}")
+        finally:
+            db.close()
+    return report
+
+
+def process_job(job, lost):
+    """
+    Run the video pipeline for a claimed job, returns processing time in seconds and the run's stats.
+    Raises JobLost instead when `lost` was set while it ran.
+    """
+    from segment_processor import process_video_segments
+    from video_processor import rerender_video
+
+    params = json.loads(job.params or "{}")
+    start_time = datetime.now()
+    if job.kind == "render":
+        result = rerender_video(job.input_path, job.output_path, tracks_path_for(job.output_path),
+                                progress=_progress_reporter(job.id, lost=lost), **params)
+    else:
+        # The HLS preview only serves clients while the job runs, start it fresh and drop it afterwards
+        hls_dir = hls_dir_for(job.output_path)
+        shutil.rmtree(hls_dir, ignore_errors=True)
+        try:
+            result = process_video_segments(job.input_path, job.output_path, progress=_progress_reporter(job.id, hls_dir, lost),
+                                            tracks_path=tracks_path_for(job.output_path), hls_dir=hls_dir,
+                                            **params)
+        finally:
+            shutil.rmtree(hls_dir, ignore_errors=True)
+    if lost.is_set():
+        raise JobLost(f"job {job.id} was taken away")
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return int((datetime.now() - start_time).total_seconds()), result['stats']
+
+
+def _cache_result(db, job):
+    """Keep a finished output for later duplicate uploads, never failing the job over it"""
+    try:
+        content_hash = db.query(Upload.content_hash).filter(Upload.video_id == job.video_id).scalar()
+        result_cache.store(db, job.cache_key, content_hash, json.loads(job.params or "{}"), job.output_path)
+    except Exception as e:
+        db.rollback()
+        print(f"Caching result of job {job.id} failed: {str(e)}")
+
+
+def run_worker():
+    """Worker process: warm the model, then claim and run jobs until terminated"""
+    from model_pool import model_pool
+
+    init_db()
+    worker_id, host, pid = worker_identity()
+    load = model_pool.warmup(replicas=1)
+
+    db = SessionLocal()
+    db.merge(Worker(id=worker_id, host=host, pid=pid, started_at=datetime.utcnow(),
+                    heartbeat_at=datetime.utcnow(), model_load_time=load['load_time'],
+                    jobs_done=0, busy_seconds=0.0))
+    db.commit()
+    db.close()
+    print(f"Worker {worker_id} ready")
+    totals = PipelineMetrics()
+
+    last_recovery = last_beat = 0.0
+    while True:
+        db = SessionLocal()
+        try:
+            now = time.monotonic()
+            if now - last_recovery > STALE_AFTER / 2:
+                requeue_stale(db)
+                last_recovery = now
+
+            job = claim_job(db, worker_id)
+            if job is None:
+                if now - last_beat > HEARTBEAT_INTERVAL:
+                    _touch_worker(worker_id, current_job_id=None)
+                    last_beat = now
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            _touch_worker(worker_id, current_job_id=job.id)
+            stop, lost = threading.Event(), threading.Event()
+            beat = threading.Thread(target=_heartbeat_loop, args=(stop, lost, job.id, worker_id), daemon=True)
+            beat.start()
+            started = time.monotonic()
+            stats = None
+            try:
+                entry = result_cache.lookup(db, job.cache_key) if job.cache_key else None
+                if entry is not None:
+                    # A duplicate queued before the first copy finished, reuse its result
+                    result_cache.link_result(entry, job.output_path)
+                    complete_job(db, job, 0, worker_id)
+                else:
+                    processing_time, stats = process_job(job, lost)
+                    # Cache before completing: duplicates are only held back while this job runs,
+                    # so the entry has to exist by the time one of them can be claimed
+                    if job.cache_key:
+                        _cache_result(db, job)
+                    complete_job(db, job, processing_time, worker_id)
+            except JobLost as e:
+                # Whoever holds the job now reports it, nothing of this run is published
+                print(f"Abandoned video {job.video_id}: {str(e)}")
+                db.rollback()
+            except Exception as e:
+                print(f"Error processing video {job.video_id} (attempt {job.attempts}): {str(e)}")
+                db.rollback()
+                fail_job(db, job, e, worker_id)
+            finally:
+                stop.set()
+                beat.join()
+
+            busy = time.monotonic() - started
+            if stats and 'metrics' in stats:
+                totals.merge(stats['metrics'])
+            db.query(Worker).filter(Worker.id == worker_id).update({
+                Worker.current_job_id: None,
+                Worker.jobs_done: Worker.jobs_done + 1,
+                Worker.busy_seconds: Worker.busy_seconds + busy,
+                Worker.heartbeat_at: datetime.utcnow(),
+                Worker.metrics: json.dumps(totals.to_dict())
+            }, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            print(f"Worker {worker_id} loop error: {str(e)}")
+            time.sleep(POLL_INTERVAL)
+        finally:
+            db.close()
+
+
+def start_workers(count=JOB_WORKERS):
+    """Spawn worker processes; spawn (not fork) so children get a fresh DB engine and model"""
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        p = ctx.Process(target=run_worker, name=f"video-worker-{i}")
+        p.start()
+        processes.append(p)
+    return processes
+
+
+def stop_workers(processes, timeout=10):
+    """Terminate workers; any job left running is recovered once its heartbeat goes stale"""
+    for p in processes:
+        p.terminate()
+    for p in processes:
+        p.join(timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Video processing workers")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="Number of worker processes")
+    args = parser.parse_args()
+
+    workers = start_workers(args.workers)
+    try:
+        for p in workers:
+            p.join()
+    except KeyboardInterrupt:
+        stop_workers(workers)
@@ -0,0 +1,75 @@
+"""
+Microbenchmark for the SORT association step.
+
+Compares the previous dense association (full iou_batch, one global linear
+assignment, Python membership loops) with the gated
+associate_detections_to_trackers over 10-500 boxes per frame.
+
+    python -m benchmarks.bench_association --sizes 10 50 100 250 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.sort import iou_batch, linear_assignment, associate_detections_to_trackers
+
+
+def make_frame(n, width=1920, height=1080, jitter=6.0, seed=0):
+    """n tracker boxes spread over a frame, plus jittered detections of the same objects"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 1, (n, 2)) * [width - 60, height - 150]
+    size = rng.uniform([20, 50], [60, 150], (n, 2))
+    trks = np.concatenate([xy, xy + size, np.zeros((n, 1))], axis=1)
+    dets = trks.copy()
+    dets[:, :4] += rng.normal(0, jitter, (n, 4))
+    dets[:, 4] = rng.uniform(0.3, 0.9, n)
+    return dets, trks
+
+
+def dense_associate(detections, trackers, iou_threshold=0.3):
+    """The previous association: full IOU matrix, global assignment, per-index membership loops"""
+    iou_matrix = iou_batch(detections, trackers)
+    a = (iou_matrix > iou_threshold).astype(np.int32)
+    if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+        matched_indices = np.stack(np.where(a), axis=1)
+    else:
+        matched_indices = linear_assignment(-iou_matrix)
+
+    unmatched_detections = [d for d in range(len(detections)) if d not in matched_indices[:, 0]]
+    unmatched_trackers = [t for t in range(len(trackers)) if t not in matched_indices[:, 1]]
+    matches = []
+    for m in matched_indices:
+        if iou_matrix[m[0], m[1]] < iou_threshold:
+            unmatched_detections.append(m[0])
+            unmatched_trackers.append(m[1])
+        else:
+            matches.append(m.reshape(1, 2))
+    matches = np.concatenate(matches, axis=0) if matches else np.empty((0, 2), dtype=int)
+    return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+
+
+def time_it(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000.0
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100, 250, 500])
+    p.add_argument("--repeats", type=int, default=50)
+    args = p.parse_args()
+
+    print(f"{'boxes':>6} {'dense ms':>10} {'gated ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        dets, trks = make_frame(n)
+        dense = time_it(lambda: dense_associate(dets, trks), args.repeats)
+        gated = time_it(lambda: associate_detections_to_trackers(dets, trks), args.repeats)
+        print(f"{n:>6} {dense:>10.3f} {gated:>10.3f} {dense / gated:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+End-to-end pipeline benchmark.
+
+Times every stage of processing on data/sample_clip.mp4 and on synthetic
+clips of moving boxes over a grid of resolutions and object counts:
+
+    decode          VideoReader.read, per installed decoder (opencv, pyav)
+    extract         utils.helpers.extract_detections on YOLO-shaped results
+    sort_update     Sort.update, and batchsort_update for BatchSort.update
+    iou_batch       detections against the previous frame's boxes
+    overlay_heatmap the full-resolution overlay_heatmap, and the cached
+                    HeatmapAccumulator.overlay the renderer uses
+    draw            OverlayRenderer.render (trails, labels, boxes)
+    encode          cv2 mp4v and, when installed, ffmpeg (release included)
+    process_video   the full VideoProcessor.process_video with the YOLO model
+
+Every stage reports throughput and per-frame latency percentiles. Results are
+written as JSON (benchmarks/results/<commit>.json by default), and --compare
+prints the fps ratio against an earlier run:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --resolutions 1280x720 --objects 50 --stages decode encode
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/3a9d5a3.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from utils.decoder import open_video, pyav_available
+from utils.encoder import FFmpegWriter, ffmpeg_available
+from utils.helpers import class_id_mask, extract_detections
+from utils.sort import Sort, BatchSort, iou_batch
+from utils.visualization import overlay_heatmap, HeatmapAccumulator
+
+SAMPLE_CLIP = os.path.join(ROOT, "data", "sample_clip.mp4")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+STAGES = ["decode", "extract", "sort_update", "iou_batch", "overlay_heatmap", "draw", "encode", "process_video"]
+
+# Same tracker settings as backend/video_processor.py, kept here so the
+# component stages run without importing the backend (and ultralytics)
+TRACKER_PARAMS = {'max_age': 8, 'min_hits': 1, 'iou_threshold': 0.3}
+# COCO ids of the classes the pipeline keeps, plus one it drops
+CLASS_NAMES = {0: "person", 2: "car", 32: "sports ball"}
+
+
+def synthetic_tracks(width, height, objects, frames, seed=0):
+    """Per-frame (N,6) [x1,y1,x2,y2,conf,cls] boxes of objects bouncing around the frame"""
+    rng = np.random.default_rng(seed)
+    scale = height / 360.0
+    size = rng.uniform([12, 30], [30, 80], (objects, 2)) * scale
+    pos = rng.uniform(0, 1, (objects, 2)) * ([width, height] - size)
+    vel = rng.uniform(-4, 4, (objects, 2)) * scale
+    cls = rng.choice(list(CLASS_NAMES), objects, p=[0.8, 0.1, 0.1]).astype(float)
+    conf = rng.uniform(0.3, 0.95, objects)
+    out = []
+    for _ in range(frames):
+        pos += vel
+        bounce = (pos < 0) | (pos > [width, height] - size)
+        vel[bounce] *= -1
+        pos = np.clip(pos, 0, [width, height] - size)
+        out.append(np.column_stack([pos, pos + size, conf, cls]))
+    return out
+
+
+def write_synthetic_clip(path, width, height, tracks, fps=30):
+    """Render boxes onto a textured background, so the encoder has some detail to work with"""
+    rng = np.random.default_rng(1)
+    background = cv2.GaussianBlur(rng.integers(40, 120, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for boxes in tracks:
+        frame = background.copy()
+        for x1, y1, x2, y2, _, cls in boxes.astype(int):
+            color = (40, 40, 220) if cls == 0 else (240, 240, 240)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+        writer.write(frame)
+    writer.release()
+
+
+class _Tensor:
+    """Just enough of a torch tensor for extract_detections"""
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class FakeResults:
+    """A YOLO Results object holding given [x1,y1,x2,y2,conf,cls] boxes"""
+
+    def __init__(self, boxes):
+        self.boxes = type("Boxes", (), {})()
+        self.boxes.data = _Tensor(boxes.astype(np.float32))
+
+
+def frames_of(path, limit):
+    with open_video(path, "opencv") as reader:
+        for _ in range(limit):
+            ret, frame = reader.read()
+            if not ret:
+                return
+            yield frame
+
+
+def summarize(latencies, total=None):
+    """Throughput and latency percentiles (ms) for per-frame timings in seconds"""
+    if not latencies:
+        return {'frames': 0}
+    ms = np.asarray(latencies) * 1000
+    total = sum(latencies) if total is None else total
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'frames': len(latencies),
+        'seconds': round(total, 4),
+        'fps': round(len(latencies) / total, 2) if total > 0 else None,
+        'latency_ms': {'mean': round(float(ms.mean()), 3), 'p50': round(float(p50), 3),
+                       'p95': round(float(p95), 3), 'p99': round(float(p99), 3),
+                       'max': round(float(ms.max()), 3)}
+    }
+
+
+def timed(fn, items):
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_decode(clip, frames):
+    results = {}
+    decoders = ["opencv"] + (["pyav"] if pyav_available() else [])
+    for decoder in decoders:
+        latencies = []
+        with open_video(clip['path'], decoder) as reader:
+            for _ in range(frames):
+                start = time.perf_counter()
+                ret, _ = reader.read()
+                if not ret:
+                    break
+                latencies.append(time.perf_counter() - start)
+        results[f"decode_{decoder}"] = summarize(latencies)
+    return results
+
+
+def bench_extract(clip, frames):
+    mask = class_id_mask(CLASS_NAMES, {"person", "sports ball"})
+    results = [FakeResults(boxes) for boxes in clip['tracks'][:frames]]
+    return {'extract': timed(lambda r: extract_detections(r, mask), results)}
+
+
+def bench_sort_update(clip, frames):
+    dets = [boxes[:, :5] for boxes in clip['tracks'][:frames]]
+    out = {}
+    for name, cls in (("sort_update", Sort), ("batchsort_update", BatchSort)):
+        tracker = cls(**TRACKER_PARAMS)
+        out[name] = timed(tracker.update, dets)
+    return out
+
+
+def bench_iou_batch(clip, frames):
+    tracks = clip['tracks'][:frames]
+    pairs = list(zip(tracks[1:], tracks[:-1]))
+    return {'iou_batch': timed(lambda p: iou_batch(p[0], p[1]), pairs)}
+
+
+def bench_overlay_heatmap(clip, frames):
+    width, height = clip['width'], clip['height']
+    heat = np.zeros((height, width), dtype=np.float32)
+    accum = HeatmapAccumulator(width, height)
+    full, cached = [], []
+    for frame, boxes in zip(frames_of(clip['path'], frames), clip['tracks']):
+        centers = ((boxes[:, :2] + boxes[:, 2:4]) / 2).astype(int)
+        for cx, cy in centers.tolist():
+            heat[min(cy, height - 1), min(cx, width - 1)] += 1
+            accum.add(cx, cy)
+        start = time.perf_counter()
+        overlay_heatmap(frame, heat, alpha=0.45)
+        full.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        accum.overlay(frame, alpha=0.45)
+        cached.append(time.perf_counter() - start)
+    return {'overlay_heatmap': summarize(full), 'heatmap_accumulator': summarize(cached)}
+
+
+def bench_draw(clip, frames):
+    from video_processor import OverlayRenderer
+
+    tracker = BatchSort(**TRACKER_PARAMS)
+    renderer = OverlayRenderer(clip['width'], clip['height'], clip['fps'])
+    latencies = []
+    for frame, boxes in zip(frames_of(clip['path'], frames), clip['tracks']):
+        tracked = tracker.update(boxes[:, :5])
+        # Track rows come back in their own order, label them by their best detection
+        best = iou_batch(tracked[:, :4], boxes[:, :4]).argmax(1) if len(tracked) else []
+        track_labels = [CLASS_NAMES[int(boxes[i, 5])] for i in best]
+        start = time.perf_counter()
+        renderer.render(frame, tracked, track_labels)
+        latencies.append(time.perf_counter() - start)
+    return {'draw': summarize(latencies)}
+
+
+def bench_encode(clip, frames):
+    size = (clip['width'], clip['height'])
+    writers = {'encode_cv2': lambda path: cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), clip['fps'], size)}
+    if ffmpeg_available():
+        writers['encode_ffmpeg'] = lambda path: FFmpegWriter(path, clip['fps'], size)
+    decoded = list(frames_of(clip['path'], frames))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, make_writer in writers.items():
+            writer = make_writer(os.path.join(tmp, f"{name}.mp4"))
+            latencies = []
+            start = time.perf_counter()
+            for frame in decoded:
+                t = time.perf_counter()
+                writer.write(frame)
+                latencies.append(time.perf_counter() - t)
+            writer.release()
+            # Encoders buffer frames, so throughput counts the final flush too
+            results[name] = summarize(latencies, time.perf_counter() - start)
+    return results
+
+
+def bench_process_video(clip, frames, processor):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        result = processor.process_video(clip['path'], os.path.join(tmp, "out.mp4"), heatmap=True)
+        total = time.perf_counter() - start
+    if not result['success']:
+        return {'process_video': {'error': result['error']}}
+    processed = result['stats']['processed_frames']
+    summary = {'frames': processed, 'seconds': round(total, 4),
+               'fps': round(processed / total, 2) if total > 0 else None,
+               'latency_ms': {'mean': round(total / processed * 1000, 3) if processed else None}}
+    return {'process_video': summary}
+
+
+def load_processor():
+    """A VideoProcessor, or the reason it cannot be built here"""
+    try:
+        from video_processor import VideoProcessor
+        return VideoProcessor(), None
+    except Exception as e:  # ultralytics, torch or the weights missing
+        return None, f"{type(e).__name__}: {e}"
+
+
+def prepare_clips(args, tmp):
+    clips = []
+    if not args.no_sample and os.path.exists(SAMPLE_CLIP):
+        with open_video(SAMPLE_CLIP, "opencv") as reader:
+            width, height, fps = reader.width, reader.height, reader.fps
+        # Detections for the component stages follow the synthetic model
+        clips.append({'name': "sample_clip", 'path': SAMPLE_CLIP, 'width': width, 'height': height,
+                      'fps': fps, 'objects': args.sample_objects,
+                      'tracks': synthetic_tracks(width, height, args.sample_objects, args.frames)})
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.lower().split("x"))
+        for objects in args.objects:
+            tracks = synthetic_tracks(width, height, objects, args.frames)
+            path = os.path.join(tmp, f"synthetic_{width}x{height}_{objects}.mp4")
+            write_synthetic_clip(path, width, height, tracks)
+            clips.append({'name': f"synthetic_{width}x{height}_{objects}", 'path': path,
+                          'width': width, 'height': height, 'fps': 30.0, 'objects': objects,
+                          'tracks': tracks})
+    return clips
+
+
+def environment():
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    meta = {
+        'commit': git("rev-parse", "--short", "HEAD"),
+        'dirty': bool(git("status", "--porcelain", "--untracked-files=no")),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'ffmpeg': ffmpeg_available()
+    }
+    if pyav_available():
+        import av
+        meta['pyav'] = av.__version__
+    return meta
+
+
+def compare(base, current):
+    """Print the fps of every stage in both runs and their ratio"""
+    old = {(r['clip'], stage): v.get('fps') for r in base['results'] for stage, v in r['stages'].items()}
+    print(f"\ncompared with {base['meta'].get('commit')} ({base['meta'].get('timestamp')})")
+    print(f"{'clip':<28} {'stage':<20} {'old fps':>10} {'new fps':>10} {'ratio':>7}")
+    for r in current['results']:
+        for stage, v in r['stages'].items():
+            before, after = old.get((r['clip'], stage)), v.get('fps')
+            if before and after:
+                print(f"{r['clip']:<28} {stage:<20} {before:>10.1f} {after:>10.1f} {after / before:>6.2f}x")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark every stage of the video pipeline")
+    p.add_argument("--resolutions", nargs="*", default=["640x360", "1280x720", "1920x1080"])
+    p.add_argument("--objects", type=int, nargs="*", default=[10, 50, 150],
+                   help="Objects per synthetic clip")
+    p.add_argument("--frames", type=int, default=150, help="Frames per clip")
+    p.add_argument("--sample-objects", type=int, default=20,
+                   help="Synthetic detections used with the sample clip for the component stages")
+    p.add_argument("--no-sample", action="store_true", help="Skip data/sample_clip.mp4")
+    p.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    p.add_argument("--output", help="JSON file to write, default benchmarks/results/<commit>.json")
+    p.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = p.parse_args()
+
+    meta = environment()
+    meta['args'] = vars(args)
+    # Stages that need the backend report why they could not run
+    processor, skipped = None, {}
+    if "process_video" in args.stages:
+        processor, reason = load_processor()
+        if processor is None:
+            skipped['process_video'] = reason
+    if "draw" in args.stages:
+        try:
+            import video_processor  # noqa: F401
+        except ImportError as e:
+            skipped['draw'] = f"{type(e).__name__}: {e}"
+    for stage, reason in skipped.items():
+        print(f"{stage} skipped: {reason}", file=sys.stderr)
+
+    benches = {
+        'decode': bench_decode,
+        'extract': bench_extract,
+        'sort_update': bench_sort_update,
+        'iou_batch': bench_iou_batch,
+        'overlay_heatmap': bench_overlay_heatmap,
+        'draw': bench_draw,
+        'encode': bench_encode
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for clip in prepare_clips(args, tmp):
+            stages = {}
+            for stage in args.stages:
+                if stage in skipped:
+                    stages[stage] = {'skipped': skipped[stage]}
+                elif stage == "process_video":
+                    stages.update(bench_process_video(clip, args.frames, processor))
+                else:
+                    stages.update(benches[stage](clip, args.frames))
+            results.append({'clip': clip['name'], 'width': clip['width'], 'height': clip['height'],
+                            'objects': clip['objects'], 'stages': stages})
+
+            print(f"\n{clip['name']}")
+            for stage, v in stages.items():
+                if 'fps' in v:
+                    print(f"  {stage:<20} {v['fps']:>10.1f} fps  mean {v['latency_ms']['mean']:>8.3f} ms"
+                          + (f"  p99 {v['latency_ms']['p99']:>8.3f} ms" if 'p99' in v['latency_ms'] else ""))
+                else:
+                    print(f"  {stage:<20} {v.get('skipped') or v.get('error')}")
+
+    report = {'meta': meta, 'results': results}
+    output = args.output
+    if output is None:
+        name = meta['commit'] or time.strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{name}{'-dirty' if meta['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
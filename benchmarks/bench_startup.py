@@ -0,0 +1,164 @@
+"""
+Import-time and worker cold-start benchmark.
+
+Every measurement runs in a fresh interpreter, as a spawned worker would:
+
+    import      time to import each module, and whether it pulled in a heavy
+                or display dependency (ultralytics, torch, matplotlib, ...)
+                that should only load on first use
+    cold start  interpreter start -> `import worker` -> model warmed up, the
+                path run_worker takes before it claims its first job
+
+Exits non-zero when a median is over its budget or a module leaks a deferred
+dependency, so it can guard startup in CI:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeats 10 --cold-start-budget 8
+    python -m benchmarks.bench_startup --skip-cold-start --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend")
+
+# Median seconds allowed for importing each module in a fresh interpreter
+IMPORT_BUDGETS = {
+    'utils.sort': 0.3,
+    'video_processor': 1.0,
+    'segment_processor': 1.0,
+    'worker': 1.5,
+    'main': 3.0
+}
+# Interpreter start to a warm model in a new worker process
+COLD_START_BUDGET = 10.0
+# Only loaded when actually used: by the first model load or the SORT demo
+DEFERRED = ("ultralytics", "torch", "matplotlib", "skimage", "filterpy", "scipy")
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'seconds': time.perf_counter() - start,
+                  'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+COLD_START_PROBE = """
+import json, time
+start = time.perf_counter()
+import worker
+from model_pool import model_pool
+imported = time.perf_counter()
+model_pool.warmup(replicas=1)
+print(json.dumps({'import': imported - start, 'model': time.perf_counter() - imported}))
+"""
+
+
+def run_probe(code, cwd=None):
+    """
+    Run code in a fresh interpreter set up like a worker, returns (wall seconds, its JSON output).
+    Without cwd it runs in a scratch directory, importing main creates the
+    database and media directories in the working directory.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, BACKEND, env.get('PYTHONPATH')]))
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd or scratch, env=env,
+                              capture_output=True, text=True)
+        wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}")
+    return wall, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_imports(modules, repeats):
+    results = {}
+    for module in modules:
+        try:
+            runs = [run_probe(IMPORT_PROBE.format(module=module, deferred=DEFERRED))[1] for _ in range(repeats)]
+        except RuntimeError as e:
+            results[module] = {'error': str(e)}
+            continue
+        times = [r['seconds'] for r in runs]
+        results[module] = {
+            'median': round(statistics.median(times), 4),
+            'min': round(min(times), 4),
+            'max': round(max(times), 4),
+            'budget': IMPORT_BUDGETS.get(module),
+            'deferred_loaded': sorted(set().union(*(r['loaded'] for r in runs)))
+        }
+    return results
+
+
+def bench_cold_start(repeats, budget=COLD_START_BUDGET):
+    try:
+        # From the backend directory, where the worker finds its model weights
+        runs = [run_probe(COLD_START_PROBE, cwd=BACKEND) for _ in range(repeats)]
+    except RuntimeError as e:
+        return {'skipped': str(e)}
+    walls = [wall for wall, _ in runs]
+    return {
+        'median': round(statistics.median(walls), 4),
+        'min': round(min(walls), 4),
+        'max': round(max(walls), 4),
+        'import_median': round(statistics.median(r['import'] for _, r in runs), 4),
+        'model_median': round(statistics.median(r['model'] for _, r in runs), 4),
+        'budget': budget
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Measure import time and worker cold start")
+    p.add_argument("--modules", nargs="+", default=list(IMPORT_BUDGETS))
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument("--cold-start-repeats", type=int, default=3)
+    p.add_argument("--cold-start-budget", type=float, default=COLD_START_BUDGET)
+    p.add_argument("--skip-cold-start", action="store_true")
+    p.add_argument("--output", help="Also write the results as JSON")
+    args = p.parse_args()
+
+    failures = []
+    imports = bench_imports(args.modules, args.repeats)
+    print(f"{'module':<20} {'median s':>9} {'budget s':>9}  deferred deps loaded")
+    for module, r in imports.items():
+        if 'error' in r:
+            print(f"{module:<20} {'error':>9} {'':>9}  {r['error']}")
+            failures.append(f"{module}: {r['error']}")
+            continue
+        budget = r['budget']
+        print(f"{module:<20} {r['median']:>9.3f} {budget if budget is not None else '-':>9}  "
+              f"{', '.join(r['deferred_loaded']) or '-'}")
+        if budget is not None and r['median'] > budget:
+            failures.append(f"{module} imports in {r['median']:.3f}s, budget {budget}s")
+        if r['deferred_loaded']:
+            failures.append(f"{module} imports {', '.join(r['deferred_loaded'])} eagerly")
+
+    cold = None
+    if not args.skip_cold_start:
+        cold = bench_cold_start(args.cold_start_repeats, args.cold_start_budget)
+        if 'skipped' in cold:
+            print(f"\nworker cold start skipped: {cold['skipped']}")
+        else:
+            print(f"\nworker cold start {cold['median']:.3f}s (imports {cold['import_median']:.3f}s, "
+                  f"model {cold['model_median']:.3f}s), budget {cold['budget']}s")
+            if cold['median'] > cold['budget']:
+                failures.append(f"worker cold start takes {cold['median']:.3f}s, budget {cold['budget']}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'imports': imports, 'cold_start': cold, 'failures': failures}, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
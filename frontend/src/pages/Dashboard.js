@@ -20,6 +20,8 @@ import './Dashboard.css';
 function Dashboard() {
   const [videos, setVideos] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [stats, setStats] = useState({
     total: 0,
     completed: 0,
@@ -33,18 +35,11 @@ function Dashboard() {
 
   const fetchVideos = async () => {
     try {
-      const response = await videoAPI.getAll();
-      const videoData = response.data;
-      setVideos(videoData);
-      
-      // Calculate stats
-      const stats = {
-        total: videoData.length,
-        completed: videoData.filter(v => v.status === 'completed').length,
-        processing: videoData.filter(v => v.status === 'processing').length,
-        failed: videoData.filter(v => v.status === 'failed').length
-      };
-      setStats(stats);
+      // Stats are counted by the server, the list arrives a page at a time
+      const [response, summary] = await Promise.all([videoAPI.getAll(), videoAPI.getSummary()]);
+      setVideos(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setStats(summary.data);
     } catch (error) {
       toast.error('Failed to fetch videos');
       console.error('Error fetching videos:', error);
@@ -53,6 +48,20 @@ function Dashboard() {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await videoAPI.getAll(nextCursor);
+      setVideos(current => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      toast.error('Failed to fetch videos');
+      console.error('Error fetching videos:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getStatusIcon = (status) => {
     switch (status) {
       case 'completed':
@@ -206,7 +215,7 @@ function Dashboard() {
                 className="video-card"
                 initial={{ opacity: 0, y: 20 }}
                 animate={{ opacity: 1, y: 0 }}
-                transition={{ duration: 0.4, delay: index * 0.1 }}
+                transition={{ duration: 0.4, delay: (index % 10) * 0.1 }}
                 whileHover={{ y: -5 }}
               >
                 <div className="video-thumbnail">
@@ -247,6 +256,14 @@ function Dashboard() {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="load-more">
+            <button className="btn-secondary" onClick={loadMore} disabled={loadingMore}>
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
       </motion.div>
     </div>
   );
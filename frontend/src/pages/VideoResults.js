@@ -26,11 +26,28 @@ function VideoResults() {
   const [playing, setPlaying] = useState(false);
   const [progress, setProgress] = useState(0);
   const [duration, setDuration] = useState(0);
+  const [jobProgress, setJobProgress] = useState(null);
 
   useEffect(() => {
     fetchVideo();
   }, [videoId]);
 
+  // Follow processing progress pushed by the server instead of polling
+  useEffect(() => {
+    if (video?.status !== 'processing') return undefined;
+
+    const source = videoAPI.events(videoId);
+    source.addEventListener('progress', (event) => {
+      const state = JSON.parse(event.data);
+      setJobProgress(state.progress);
+      if (state.status !== 'processing') {
+        source.close();
+        fetchVideo();
+      }
+    });
+    return () => source.close();
+  }, [videoId, video?.status]);
+
   const fetchVideo = async () => {
     try {
       const response = await videoAPI.getById(videoId);
@@ -168,12 +185,28 @@ function VideoResults() {
                   }
                 }}
               />
+            ) : video.status === 'processing' && jobProgress?.preview_url ? (
+              // Finished HLS segments can be watched while the rest is still processing
+              <ReactPlayer
+                url={`http://localhost:8000${jobProgress.preview_url}`}
+                width="100%"
+                height="100%"
+                playing
+                muted
+                controls
+              />
             ) : video.status === 'processing' ? (
               <div className="processing-overlay">
                 <div className="processing-content">
                   <RefreshCw className="processing-icon" />
                   <h3>Processing Video</h3>
                   <p>AI is analyzing your video for player and ball tracking...</p>
+                  {jobProgress && (
+                    <p>
+                      {jobProgress.frames_done} / {jobProgress.total_frames} frames
+                      {jobProgress.eta != null && ` · about ${formatTime(jobProgress.eta)} left`}
+                    </p>
+                  )}
                   <div className="processing-stats">
                     <div className="stat">
                       <Activity size={20} />
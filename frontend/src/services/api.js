@@ -48,8 +48,14 @@ export const videoAPI = {
       'Content-Type': 'multipart/form-data',
     },
   }),
-  getAll: () => api.get('/videos'),
+  // One page of videos, newest first; the next page's cursor is in the X-Next-Cursor header
+  getAll: (cursor) => api.get('/videos', { params: cursor ? { cursor } : {} }),
+  getSummary: () => api.get('/videos/summary'),
   getById: (videoId) => api.get(`/videos/${videoId}`),
+  // Server-Sent Events with processing progress; EventSource cannot send headers
+  events: (videoId) => new EventSource(
+    `${API_BASE_URL}/videos/${videoId}/events?token=${encodeURIComponent(localStorage.getItem('token') || '')}`
+  ),
 };
 
 export default api;
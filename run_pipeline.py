@@ -5,7 +5,7 @@ import cv2
 import numpy as np
 #from sort import Sort
 from utils.sort import Sort
-from utils.visualization import draw_tracks, overlay_heatmap
+from utils.visualization import draw_tracks, HeatmapAccumulator
 from utils.helpers import detect_bboxes, centroid_from_bbox, update_velocities
 
 def parse_args():
@@ -36,7 +36,7 @@ def main():
 
     tracker = Sort(max_age=8, min_hits=1, iou_threshold=0.3)
     trails, velocities = {}, {}
-    heatmap_accum = np.zeros((h, w), dtype=np.float32)
+    heatmap_accum = HeatmapAccumulator(w, h)
 
     while True:
         ret, frame = cap.read()
@@ -61,11 +61,11 @@ def main():
             trails.setdefault(tid, []).append((cx, cy))
             trails[tid] = trails[tid][-args.trail_len:]
             velocities[tid] = update_velocities(trails[tid], fps)
-            if args.heatmap: heatmap_accum[cy, cx] += 1
+            if args.heatmap: heatmap_accum.add(cx, cy)
 
         vis = draw_tracks(frame.copy(), tracked, trails, velocities, fps)
         if args.heatmap:
-            vis = overlay_heatmap(vis, heatmap_accum, alpha=0.45)
+            vis = heatmap_accum.overlay(vis, alpha=0.45)
 
         writer.write(vis)
         if args.show:
@@ -209,12 +209,14 @@ if __name__ == "__main__":
 
 """
 import argparse
+import time
 import cv2
 import numpy as np
 from ultralytics import YOLO
-from utils.sort import Sort
-from utils.visualization import overlay_heatmap
-from utils.helpers import centroid_from_bbox, update_velocities
+from utils.sort import BatchSort
+from utils.keyframes import KeyframeScheduler
+from utils.visualization import HeatmapAccumulator
+from utils.helpers import centroid_from_bbox, update_velocities, class_id_mask, extract_detections
 
 
 def parse_args():
@@ -224,6 +226,10 @@ def parse_args():
     p.add_argument("--show", action="store_true", help="Show live window")
     p.add_argument("--heatmap", action="store_true", help="Enable heatmap overlay")
     p.add_argument("--trail_len", type=int, default=30, help="Trajectory trail length")
+    p.add_argument("--batch_size", type=int, default=1, help="Frames per YOLO inference call")
+    p.add_argument("--detect_every", type=int, default=1, help="Run YOLO every N frames, track in between")
+    p.add_argument("--motion_threshold", type=float, default=None,
+                   help="Also detect when mean grey-level change since the last keyframe exceeds this")
     return p.parse_args()
 
 
@@ -246,95 +252,126 @@ def main():
     # Load YOLOv8 model
     model = YOLO("yolov8n.pt")
     allowed_classes = {"person", "sports ball"}
+    class_mask = class_id_mask(model.names, allowed_classes)
 
     # Tracker + buffers
-    tracker = Sort(max_age=8, min_hits=1, iou_threshold=0.3)
+    tracker = BatchSort(max_age=8, min_hits=1, iou_threshold=0.3)
     trails, velocities, labels = {}, {}, {}
-    heatmap_accum = np.zeros((h, w), dtype=np.float32)
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+    heatmap_accum = HeatmapAccumulator(w, h)
+    scheduler = KeyframeScheduler(args.detect_every, args.motion_threshold)
+
+    frame_count = 0
+    keyframes = 0
+    stop = False
+    start_time = time.perf_counter()
+
+    while not stop:
+        # Decode up to batch_size frames
+        batch = []
+        while len(batch) < args.batch_size:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+        if not batch:
             break
 
-        # Run YOLO inference
-        results = model(frame, verbose=False)[0]
-        dets = []
-        cls_map = {}
-
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            cls_name = model.names[cls_id]
-            if cls_name in allowed_classes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                conf = float(box.conf[0])
-                dets.append([x1, y1, x2, y2, conf])
-                cls_map[(x1, y1, x2, y2)] = cls_name
-
-        dets = np.array(dets)
-        if len(dets) > 0:
-            tracked = tracker.update(dets)
-        else:
-            tracked = []
-
-        vis = frame.copy()
-
-        for x1, y1, x2, y2, tid in tracked:
-            tid = int(tid)
-            cx, cy = centroid_from_bbox((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
-
-            # Save class name
-            bbox_key = (int(x1), int(y1), int(x2), int(y2))
-            label = cls_map.get(bbox_key, "object")
-            labels[tid] = label
-
-            # Trails
-            trails.setdefault(tid, []).append((cx, cy))
-            trails[tid] = trails[tid][-args.trail_len:]
-
-            # Velocities
-            velocities[tid] = update_velocities(trails[tid], fps)
-
-            # Heatmap
+        # Run YOLO inference once over the keyframes of the batch
+        keys = [i for i, f in enumerate(batch) if scheduler.is_keyframe(f)]
+        batch_results = [None] * len(batch)
+        if keys:
+            for i, r in zip(keys, model([batch[i] for i in keys], verbose=False)):
+                batch_results[i] = r
+
+        for frame, results in zip(batch, batch_results):
+            frame_count += 1
+            if results is not None:
+                keyframes += 1
+                dets = extract_detections(results, class_mask)
+                cls_map = {
+                    tuple(box): model.names[cls_id]
+                    for box, cls_id in zip(dets[:, :4].astype(int).tolist(),
+                                           dets[:, 5].astype(int).tolist())
+                }
+                if len(dets) > 0:
+                    tracked = tracker.update(dets)
+                else:
+                    tracked = []
+            else:
+                # Skipped frame: carry tracks forward on the Kalman prediction
+                tracked = tracker.coast()
+                cls_map = None
+
+            vis = frame.copy()
+
+            for x1, y1, x2, y2, tid in tracked:
+                tid = int(tid)
+                cx, cy = centroid_from_bbox((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+
+                # Save class name
+                bbox_key = (int(x1), int(y1), int(x2), int(y2))
+                if cls_map is not None:
+                    label = cls_map.get(bbox_key, "object")
+                    labels[tid] = label
+                else:
+                    label = labels.get(tid, "object")
+
+                # Trails
+                trails.setdefault(tid, []).append((cx, cy))
+                trails[tid] = trails[tid][-args.trail_len:]
+
+                # Velocities
+                velocities[tid] = update_velocities(trails[tid], fps)
+
+                # Heatmap
+                if args.heatmap:
+                    heatmap_accum.add(cx, cy)
+
+                # Draw trails
+                for i in range(1, len(trails[tid])):
+                    cv2.line(vis, trails[tid][i - 1], trails[tid][i], (0, 255, 0), 2)
+
+                # Velocity text
+                vx, vy = velocities[tid]
+                cv2.putText(vis, f"v=({vx:.1f},{vy:.1f})", (cx, cy - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+
+                # Ball forward trajectory prediction
+                if label == "sports ball":
+                    for step in range(1, 20):  # predict 20 frames ahead
+                        fx, fy = int(cx + vx * step), int(cy + vy * step)
+                        if 0 <= fx < w and 0 <= fy < h:
+                            cv2.circle(vis, (fx, fy), 2, (0, 0, 255), -1)
+
+                # Draw bbox + label
+                color = (255, 0, 0) if label == "person" else (0, 255, 255)
+                cv2.rectangle(vis, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+                cv2.putText(vis, f"{label} ID{tid}", (int(x1), int(y1) - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+            # Overlay heatmap
             if args.heatmap:
-                heatmap_accum[cy, cx] += 1
-
-            # Draw trails
-            for i in range(1, len(trails[tid])):
-                cv2.line(vis, trails[tid][i - 1], trails[tid][i], (0, 255, 0), 2)
-
-            # Velocity text
-            vx, vy = velocities[tid]
-            cv2.putText(vis, f"v=({vx:.1f},{vy:.1f})", (cx, cy - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+                vis = heatmap_accum.overlay(vis, alpha=0.45)
 
-            # Ball forward trajectory prediction
-            if label == "sports ball":
-                for step in range(1, 20):  # predict 20 frames ahead
-                    fx, fy = int(cx + vx * step), int(cy + vy * step)
-                    if 0 <= fx < w and 0 <= fy < h:
-                        cv2.circle(vis, (fx, fy), 2, (0, 0, 255), -1)
-
-            # Draw bbox + label
-            color = (255, 0, 0) if label == "person" else (0, 255, 255)
-            cv2.rectangle(vis, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-            cv2.putText(vis, f"{label} ID{tid}", (int(x1), int(y1) - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            writer.write(vis)
+            if args.show:
+                cv2.imshow("YOLO Tracker", vis)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    stop = True
+                    break
 
-        # Overlay heatmap
-        if args.heatmap:
-            vis = overlay_heatmap(vis, heatmap_accum, alpha=0.45)
+        if len(batch) < args.batch_size:
+            break
 
-        writer.write(vis)
-        if args.show:
-            cv2.imshow("YOLO Tracker", vis)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
+    elapsed = time.perf_counter() - start_time
 
     cap.release()
     writer.release()
     cv2.destroyAllWindows()
     print(f"✅ Done. Output saved to {args.output}")
+    if elapsed > 0:
+        print(f"Processed {frame_count} frames at {frame_count / elapsed:.1f} FPS (batch size {args.batch_size})")
+    print(f"Detection ran on {keyframes}/{frame_count} frames")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+import cv2
+
+
+class FrameBatch(list):
+    """
+    Decoded frames in order. When the reader downscales for inference,
+    inference_frames holds the same frames at the smaller size and
+    inference_scale the (x, y) factors that map their pixels back.
+    """
+    inference_frames = None
+    inference_scale = None
+
+
+def inference_dims(width, height, max_side):
+    """Frame size with the longer side cut down to max_side, None if no smaller"""
+    if not max_side or max(width, height) <= max_side:
+        return None
+    scale = max_side / max(width, height)
+    # Even sizes keep the 4:2:0 chroma planes aligned when swscale does the resize
+    return max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2)
+
+
+class VideoReader:
+    """
+    Sequential frame source with the video's metadata and frame accurate seeking.
+
+    read() mirrors cv2.VideoCapture.read(). read_batch() additionally produces
+    the frames downscaled for inference when inference_size is set, so
+    detection can run on small frames while rendering keeps full resolution.
+    """
+
+    def __init__(self, inference_size=None):
+        self.inference_size = inference_size
+        self.inference_dims = None
+        self.inference_scale = None
+
+    def _setup_inference(self):
+        self.inference_dims = inference_dims(self.width, self.height, self.inference_size)
+        if self.inference_dims is not None:
+            self.inference_scale = (self.width / self.inference_dims[0], self.height / self.inference_dims[1])
+
+    def read(self):
+        raise NotImplementedError
+
+    def _read_pair(self):
+        """Next (frame, downscaled frame) or None at the end"""
+        ret, frame = self.read()
+        if not ret:
+            return None
+        return frame, cv2.resize(frame, self.inference_dims, interpolation=cv2.INTER_AREA)
+
+    def read_batch(self, size):
+        batch = FrameBatch()
+        if self.inference_dims is None:
+            while len(batch) < size:
+                ret, frame = self.read()
+                if not ret:
+                    break
+                batch.append(frame)
+            return batch
+
+        batch.inference_frames = []
+        batch.inference_scale = self.inference_scale
+        while len(batch) < size:
+            pair = self._read_pair()
+            if pair is None:
+                break
+            batch.append(pair[0])
+            batch.inference_frames.append(pair[1])
+        return batch
+
+    def resize_for_inference(self, frame):
+        """A full size frame at the inference size, for detections outside read_batch"""
+        if self.inference_dims is None:
+            return frame
+        return cv2.resize(frame, self.inference_dims, interpolation=cv2.INTER_AREA)
+
+    def seek(self, frame_index):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class OpenCVReader(VideoReader):
+    """cv2.VideoCapture, available everywhere OpenCV is"""
+
+    def __init__(self, path, threads=0, inference_size=None):
+        super().__init__(inference_size)
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._setup_inference()
+
+    def read(self):
+        return self.cap.read()
+
+    def seek(self, frame_index):
+        # OpenCV's FFmpeg backend seeks to the preceding keyframe and decodes up to the frame
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVReader(VideoReader):
+    """
+    FFmpeg through PyAV: multi-threaded decoding, colour conversion and
+    downscaling straight from the decoded YUV frame, and seeks that land on
+    the exact frame asked for.
+    """
+
+    def __init__(self, path, threads=0, inference_size=None):
+        super().__init__(inference_size)
+        import av
+
+        try:
+            self.container = av.open(path)
+        except av.error.FFmpegError as e:
+            raise ValueError(f"Cannot open video: {path} ({e})")
+        if not self.container.streams.video:
+            self.container.close()
+            raise ValueError(f"Cannot open video: {path} (no video stream)")
+        self.stream = self.container.streams.video[0]
+        # Frame and slice threads; 0 lets FFmpeg use every core
+        self.stream.thread_type = "AUTO"
+        self.stream.codec_context.thread_count = threads
+
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 30.0)
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.frame_count = self.stream.frames
+        if not self.frame_count and self.stream.duration is not None:
+            self.frame_count = round(float(self.stream.duration * self.stream.time_base) * self.fps)
+        self._start_pts = self.stream.start_time or 0
+        self._frames = self.container.decode(self.stream)
+        self._skip_until = None
+        self._setup_inference()
+
+    def _next_frame(self):
+        for frame in self._frames:
+            if self._skip_until is not None:
+                # Decoding restarted at the keyframe before a seek target
+                if frame.pts is not None and self._frame_index(frame.pts) < self._skip_until:
+                    continue
+                self._skip_until = None
+            return frame
+        return None
+
+    def _frame_index(self, pts):
+        return round(float((pts - self._start_pts) * self.stream.time_base) * self.fps)
+
+    def read(self):
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        return True, frame.to_ndarray(format="bgr24")
+
+    def _read_pair(self):
+        frame = self._next_frame()
+        if frame is None:
+            return None
+        width, height = self.inference_dims
+        small = frame.reformat(width=width, height=height, format="bgr24", interpolation="AREA")
+        return frame.to_ndarray(format="bgr24"), small.to_ndarray()
+
+    def seek(self, frame_index):
+        pts = self._start_pts + int(frame_index / self.fps / self.stream.time_base)
+        self.container.seek(pts, stream=self.stream, backward=True, any_frame=False)
+        self._frames = self.container.decode(self.stream)
+        self._skip_until = frame_index
+
+    def release(self):
+        self.container.close()
+
+
+DECODERS = {
+    'opencv': OpenCVReader,
+    'pyav': PyAVReader
+}
+
+
+def pyav_available():
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def open_video(path, decoder="auto", threads=0, inference_size=None):
+    """
+    Open a video for reading.
+
+    Args:
+        decoder (str): 'pyav', 'opencv', or 'auto' for PyAV when it is installed
+        threads (int): Decode threads (PyAV only), 0 for automatic
+        inference_size (int): Longest side of the frames read_batch downscales
+            for inference, None to detect on full size frames
+
+    Returns:
+        VideoReader
+    """
+    if decoder == "auto":
+        decoder = "pyav" if pyav_available() else "opencv"
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder: {decoder}")
+    return DECODERS[decoder](path, threads=threads, inference_size=inference_size)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+from utils.hls import PLAYLIST_NAME
+
+
+def ffmpeg_available(ffmpeg="ffmpeg"):
+    return shutil.which(ffmpeg) is not None
+
+
+class FFmpegWriter:
+    """
+    cv2.VideoWriter replacement that pipes raw BGR frames into an ffmpeg
+    subprocess, so the output can use any encoder ffmpeg has (H.264 by
+    default) with a chosen CRF, preset and thread count.
+
+    Frames already laid out as packed uint8 BGR are written straight from
+    their memory; anything else is first copied into one reusable buffer.
+    The MP4 gets its index at the front (faststart) so browsers can start
+    playing it before it is fully downloaded.
+
+    With hls_dir, ffmpeg's tee muxer also cuts the same encoded stream into
+    HLS segments and an EVENT playlist, so the preview costs no second encode.
+    output_path may then be None to write the HLS stream only.
+    """
+
+    def __init__(self, output_path, fps, size, codec="libx264", crf=23, preset="veryfast", threads=0,
+                 hls_dir=None, hls_time=4.0, ffmpeg="ffmpeg"):
+        width, height = size
+        self._shape = (height, width, 3)
+        self._buffer = np.empty(self._shape, dtype=np.uint8)
+        self._stderr = tempfile.TemporaryFile()
+
+        cmd = [
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}", "-i", "-",
+            "-an", "-c:v", codec, "-pix_fmt", "yuv420p", "-threads", str(threads)
+        ]
+        if width % 2 or height % 2:
+            # 4:2:0 chroma needs even dimensions
+            cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        if crf is not None:
+            cmd += ["-crf", str(crf)]
+        if preset:
+            cmd += ["-preset", preset]
+        if hls_dir:
+            os.makedirs(hls_dir, exist_ok=True)
+            segments = os.path.join(hls_dir, "segment_%05d.ts")
+            hls = (f"[f=hls:hls_time={hls_time}:hls_playlist_type=event:hls_flags=temp_file:"
+                   f"hls_segment_filename={segments}]{os.path.join(hls_dir, PLAYLIST_NAME)}")
+            # Segments have to start on keyframes, and libx264 places those by scene otherwise
+            cmd += ["-force_key_frames", f"expr:gte(t,n_forced*{hls_time})", "-map", "0:v", "-f", "tee",
+                    f"[f=mp4:movflags=+faststart]{output_path}|{hls}" if output_path else hls]
+        else:
+            cmd += ["-movflags", "+faststart", "-f", "mp4", output_path]
+
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=self._stderr)
+
+    def isOpened(self):
+        return self._process.poll() is None
+
+    def write(self, frame):
+        if frame.shape != self._shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match the encoder's {self._shape}")
+        if frame.dtype != np.uint8 or not frame.flags.c_contiguous:
+            np.copyto(self._buffer, frame, casting="unsafe")
+            frame = self._buffer
+        try:
+            self._process.stdin.write(frame.data)
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg exited early: {self._error()}")
+
+    def _error(self):
+        self._process.wait()
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip() or f"exit code {self._process.returncode}"
+
+    def release(self):
+        """Flush and close the encoder, raises if ffmpeg failed"""
+        if self._process.stdin.closed:
+            return
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        code = self._process.wait()
+        error = self._error() if code != 0 else None
+        self._stderr.close()
+        if error is not None:
+            raise RuntimeError(f"ffmpeg failed: {error}")
+
+    def abort(self):
+        """Stop ffmpeg without finishing the output, e.g. after the pipeline failed"""
+        if self._process.stdin.closed:
+            return
+        self._process.kill()
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._process.wait()
+        self._stderr.close()
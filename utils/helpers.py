@@ -18,6 +18,28 @@ def detect_bboxes(gray_frame, min_area=150):
         boxes.append((x,y,w,h))
     return boxes
 
+def class_id_mask(names, allowed_classes):
+    """Boolean lookup table over model class ids, True for names in allowed_classes"""
+    mask = np.zeros(max(names) + 1, dtype=bool)
+    for cls_id, cls_name in names.items():
+        mask[cls_id] = cls_name in allowed_classes
+    return mask
+
+def extract_detections(results, class_mask):
+    """
+    Pull all boxes out of a YOLO result at once as an (N,6) array of
+    [x1, y1, x2, y2, conf, cls], keeping only classes set in class_mask.
+    Coordinates are truncated to whole pixels.
+    """
+    data = results.boxes.data.cpu().numpy()
+    if len(data) == 0:
+        return np.empty((0, 6))
+    cls = data[:, -1].astype(np.int64)
+    keep = (cls < len(class_mask)) & class_mask[np.minimum(cls, len(class_mask) - 1)]
+    dets = data[keep][:, [0, 1, 2, 3, -2, -1]].astype(np.float64)
+    dets[:, :4] = np.trunc(dets[:, :4])
+    return dets
+
 def centroid_from_bbox(bbox):
     x, y, w, h = bbox
     return x + w // 2, y + h // 2
@@ -0,0 +1,8 @@
+import os
+
+PLAYLIST_NAME = "index.m3u8"
+
+
+def hls_dir_for(video_path):
+    """Directory holding the HLS preview of a processed video"""
+    return os.path.splitext(video_path)[0] + ".hls"
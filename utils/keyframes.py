@@ -0,0 +1,62 @@
+import cv2
+
+
+class KeyframeScheduler:
+    """
+    Decides which frames get a detector pass when tracking between keyframes.
+
+    A frame is a keyframe every `interval` frames, or earlier when the scene
+    has changed by more than `motion_threshold` (mean absolute grey-level
+    difference against the last keyframe, 0-255). Independently,
+    `needs_refresh` asks for a detection when any reported track's positional
+    uncertainty exceeds `uncertainty_threshold` pixels.
+    """
+
+    def __init__(self, interval=1, motion_threshold=None, uncertainty_threshold=None, motion_size=(64, 36)):
+        if interval < 1:
+            raise ValueError(f"interval must be >= 1, got {interval}")
+        self.interval = interval
+        self.motion_threshold = motion_threshold
+        self.uncertainty_threshold = uncertainty_threshold
+        self.motion_size = motion_size
+        self._since_keyframe = None
+        self._reference = None
+
+    @property
+    def every_frame(self):
+        return self.interval == 1
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, self.motion_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def is_keyframe(self, frame):
+        """Call once per decoded frame, in order"""
+        if self.every_frame:
+            return True
+
+        thumb = self._thumbnail(frame) if self.motion_threshold is not None else None
+        due = self._since_keyframe is None or self._since_keyframe + 1 >= self.interval
+        if not due and thumb is not None:
+            due = float(cv2.absdiff(thumb, self._reference).mean()) > self.motion_threshold
+
+        if due:
+            self._since_keyframe = 0
+            self._reference = thumb
+        else:
+            self._since_keyframe += 1
+        return due
+
+    def needs_refresh(self, tracker):
+        """
+        True when coasting tracks have become too uncertain to keep interpolating.
+        The forced detection restarts the interval, frames already scheduled
+        ahead (later in the batch or queued by the pipeline) keep theirs.
+        """
+        if self.uncertainty_threshold is None:
+            return False
+        sigma = tracker.uncertainty()
+        refresh = len(sigma) > 0 and float(sigma.max()) > self.uncertainty_threshold
+        if refresh:
+            self._since_keyframe = 0
+        return refresh
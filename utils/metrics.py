@@ -0,0 +1,161 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+# Seconds from a frame being decoded to it being handed to the encoder
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Tracks drawn on one frame
+TRACK_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+STAGES = ("decode", "infer", "track", "draw", "heatmap", "encode")
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus sense: a bucket counts values <= its bound"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, data):
+        """Add the counts of another histogram's to_dict() with the same buckets"""
+        if tuple(data['buckets']) != self.buckets:
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        self.sum += data['sum']
+        self.count += data['count']
+
+    def to_dict(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics, self.stage = metrics, stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.add(self.stage, time.perf_counter() - self.start)
+
+
+class PipelineMetrics:
+    """
+    Hot-path instrumentation of one processing run.
+
+    Accumulates the time spent in each stage (decode, infer, track, draw,
+    heatmap, encode), and histograms of per-frame latency and of tracks per
+    frame. When stages run on their own threads each one accumulates its own
+    busy time, so the stage times can add up to more than the wall time.
+
+    Frame latency is measured from decoded() to encoded(). Frames pass every
+    stage in order, so the timestamps are a FIFO and need no frame ids.
+    """
+
+    def __init__(self):
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.frames = 0
+        self.frame_latency = Histogram(LATENCY_BUCKETS)
+        self.tracks_per_frame = Histogram(TRACK_COUNT_BUCKETS)
+        self._decoded_at = deque()
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """Context manager adding the duration of its block to a stage"""
+        return _StageTimer(self, name)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def decoded(self, count=1):
+        now = time.perf_counter()
+        self._decoded_at.extend([now] * count)
+
+    def encoded(self):
+        now = time.perf_counter()
+        if self._decoded_at:
+            self.frame_latency.observe(now - self._decoded_at.popleft())
+        self.frames += 1
+
+    def merge(self, data):
+        """Add another run's to_dict(), e.g. into a worker's running totals"""
+        for stage, seconds in data['stage_seconds'].items():
+            self.add(stage, seconds)
+        self.frames += data['frames']
+        self.frame_latency.merge(data['frame_latency'])
+        self.tracks_per_frame.merge(data['tracks_per_frame'])
+
+    def to_dict(self):
+        return {
+            'frames': self.frames,
+            'stage_seconds': {stage: round(seconds, 6) for stage, seconds in self.stage_seconds.items()},
+            'frame_latency': self.frame_latency.to_dict(),
+            'tracks_per_frame': self.tracks_per_frame.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        metrics = cls()
+        metrics.merge(data)
+        return metrics
+
+
+class PrometheusText:
+    """Builds a Prometheus text exposition (format 0.0.4), one family at a time"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.lines = []
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+        return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+    @staticmethod
+    def _value(value):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+    def family(self, name, kind, help_text, samples):
+        """
+        Args:
+            kind (str): counter, gauge or untyped
+            samples (list): (labels dict, value) pairs
+        """
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            self.lines.append(f"{name}{self._labels(labels)} {self._value(value)}")
+
+    def histogram(self, name, help_text, series):
+        """series: (labels dict, Histogram.to_dict()) pairs"""
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} histogram")
+        for labels, data in series:
+            cumulative = 0
+            for bound, count in zip(list(data['buckets']) + [float("inf")], data['counts']):
+                cumulative += count
+                le = self._value(bound if bound == float("inf") else float(bound))
+                self.lines.append(f"{name}_bucket{self._labels(dict(labels, le=le))} {cumulative}")
+            self.lines.append(f"{name}_sum{self._labels(labels)} {self._value(float(data['sum']))}")
+            self.lines.append(f"{name}_count{self._labels(labels)} {data['count']}")
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
@@ -0,0 +1,131 @@
+import queue
+import threading
+
+_END = object()
+
+
+class StagedPipeline:
+    """
+    Runs decode -> infer -> track/render -> encode as separate stages joined by
+    bounded queues.
+
+    Decode, inference and encode each get their own thread so OpenCV's
+    GIL-releasing I/O and the model's native kernels overlap. Tracking and
+    rendering stay on the calling thread, in frame order, because they mutate
+    shared tracker state. Every stage is a single consumer of a FIFO queue, so
+    output order always matches input order.
+    """
+
+    QUEUES = ("decoded", "inferred", "rendered")
+
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in self.QUEUES}
+        self._samples = {name: [] for name in self.QUEUES}
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, name, item):
+        q = self.queues[name]
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            self._samples[name].append(q.qsize())
+            return True
+        return False
+
+    def _get(self, name):
+        q = self.queues[name]
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _END
+
+    def _run_stage(self, target):
+        try:
+            target()
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def run(self, read_batch, infer, process, write):
+        """
+        Drive the pipeline to completion.
+
+        Args:
+            read_batch (callable): returns a list of decoded frames, empty when done
+            infer (callable): maps a list of frames to a list of per-frame results
+            process (callable): (frame, result) -> annotated frame, called in order
+            write (callable): encodes one annotated frame
+
+        Returns:
+            int: number of frames processed
+        """
+        def decode():
+            while not self._stop.is_set():
+                batch = read_batch()
+                if not batch:
+                    break
+                if not self._put("decoded", batch):
+                    return
+            self._put("decoded", _END)
+
+        def run_infer():
+            while True:
+                batch = self._get("decoded")
+                if batch is _END:
+                    break
+                if not self._put("inferred", (batch, infer(batch))):
+                    return
+            self._put("inferred", _END)
+
+        def encode():
+            while True:
+                frame = self._get("rendered")
+                if frame is _END:
+                    break
+                write(frame)
+
+        threads = [
+            threading.Thread(target=self._run_stage, args=(fn,), name=f"pipeline-{fn.__name__}", daemon=True)
+            for fn in (decode, run_infer, encode)
+        ]
+        for t in threads:
+            t.start()
+
+        frame_count = 0
+        try:
+            while True:
+                item = self._get("inferred")
+                if item is _END:
+                    break
+                for frame, result in zip(*item):
+                    if not self._put("rendered", process(frame, result)):
+                        break
+                    frame_count += 1
+            self._put("rendered", _END)
+        except Exception:
+            self._stop.set()
+            raise
+        finally:
+            for t in threads:
+                t.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return frame_count
+
+    def occupancy(self):
+        """Mean and peak depth of each queue, sampled on every put"""
+        report = {}
+        for name, samples in self._samples.items():
+            report[name] = {
+                'mean': sum(samples) / len(samples) if samples else 0.0,
+                'max': max(samples) if samples else 0,
+                'capacity': self.queue_size
+            }
+        return report
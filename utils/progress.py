@@ -0,0 +1,55 @@
+import time
+
+
+class ProgressMeter:
+    """
+    Turns a running frame count into throttled progress reports.
+
+    The callback gets a dict with the stage name, frames_done, total_frames,
+    fps (exponential moving average over reporting intervals) and eta in
+    seconds (None while unknown). It is called at most once every `interval`
+    seconds, plus once from finish(), so it can afford a database write.
+    """
+
+    def __init__(self, total_frames, callback=None, stage="processing", interval=1.0, smoothing=0.3):
+        self.total_frames = total_frames
+        self.callback = callback
+        self.stage = stage
+        self.interval = interval
+        self.smoothing = smoothing
+        self.frames_done = 0
+        self.fps = 0.0
+        self._last_time = time.perf_counter()
+        self._last_frames = 0
+
+    def advance(self, frames=1):
+        self.update(self.frames_done + frames)
+
+    def update(self, frames_done):
+        self.frames_done = frames_done
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_time >= self.interval:
+            self._report(now)
+
+    def _report(self, now):
+        elapsed = now - self._last_time
+        if elapsed > 0 and self.frames_done > self._last_frames:
+            rate = (self.frames_done - self._last_frames) / elapsed
+            self.fps = rate if self.fps == 0 else self.smoothing * rate + (1 - self.smoothing) * self.fps
+        self._last_time, self._last_frames = now, self.frames_done
+
+        remaining = max(self.total_frames - self.frames_done, 0) if self.total_frames else None
+        self.callback({
+            'stage': self.stage,
+            'frames_done': self.frames_done,
+            'total_frames': self.total_frames,
+            'fps': round(self.fps, 2),
+            'eta': round(remaining / self.fps, 1) if remaining is not None and self.fps > 0 else None
+        })
+
+    def finish(self):
+        """Report the final count regardless of throttling"""
+        if self.callback is not None:
+            self._report(time.perf_counter())
@@ -4,29 +4,26 @@ from __future__ import print_function
 
 import os
 import numpy as np
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from skimage import io
 
-import glob
-import time
-import argparse
-from filterpy.kalman import KalmanFilter
+# Only numpy (and lap if installed) at import time. filterpy is loaded by the
+# first KalmanBoxTracker, the display and CLI dependencies by the demo below,
+# so processes that only need BatchSort start fast and work without a display.
 
-np.random.seed(0)
+
+try:
+  import lap
+except ImportError:
+  lap = None
 
 
 def linear_assignment(cost_matrix):
-  try:
-    import lap
+  # Solver is resolved once at import, a failed `import lap` per call is expensive
+  if lap is not None:
     _, x, y = lap.lapjv(cost_matrix, extend_cost=True)
     return np.array([[y[i],i] for i in x if i >= 0]) #
-  except ImportError:
-    from scipy.optimize import linear_sum_assignment
-    x, y = linear_sum_assignment(cost_matrix)
-    return np.array(list(zip(x, y)))
+  from scipy.optimize import linear_sum_assignment
+  x, y = linear_sum_assignment(cost_matrix)
+  return np.stack([x, y], axis=1)
 
 
 def iou_batch(bb_test, bb_gt):
@@ -85,6 +82,7 @@ class KalmanBoxTracker(object):
     """
     Initialises a tracker using initial bounding box.
     """
+    from filterpy.kalman import KalmanFilter
     self.kf = KalmanFilter(dim_x=7, dim_z=4) 
     self.kf.F = np.array([[1,0,0,0,1,0,0],[0,1,0,0,0,1,0],[0,0,1,0,0,0,1],[0,0,0,1,0,0,0],  [0,0,0,0,1,0,0],[0,0,0,0,0,1,0],[0,0,0,0,0,0,1]])
     self.kf.H = np.array([[1,0,0,0,0,0,0],[0,1,0,0,0,0,0],[0,0,1,0,0,0,0],[0,0,0,1,0,0,0]])
@@ -131,45 +129,105 @@ class KalmanBoxTracker(object):
     return convert_x_to_bbox(self.kf.x)
 
 
+# Below this many detection/tracker pairs a full IOU matrix is cheaper than gating
+DENSE_IOU_MAX_PAIRS = 4096
+
+
+def iou_pairs(bb_test, bb_gt):
+  """
+  Elementwise IOU between matching rows of two [x1,y1,x2,y2] arrays
+  """
+  xx1 = np.maximum(bb_test[..., 0], bb_gt[..., 0])
+  yy1 = np.maximum(bb_test[..., 1], bb_gt[..., 1])
+  xx2 = np.minimum(bb_test[..., 2], bb_gt[..., 2])
+  yy2 = np.minimum(bb_test[..., 3], bb_gt[..., 3])
+  w = np.maximum(0., xx2 - xx1)
+  h = np.maximum(0., yy2 - yy1)
+  wh = w * h
+  o = wh / ((bb_test[..., 2] - bb_test[..., 0]) * (bb_test[..., 3] - bb_test[..., 1])
+    + (bb_gt[..., 2] - bb_gt[..., 0]) * (bb_gt[..., 3] - bb_gt[..., 1]) - wh)
+  return(o)
+
+
+def gate_candidates(detections, trackers):
+  """
+  Returns (det_idx, trk_idx) for every pair whose x-extents can overlap, using a
+  sorted sweep over tracker left edges instead of the full N*M grid
+  """
+  order = np.argsort(trackers[:, 0], kind='stable')
+  x1s = trackers[order, 0]
+  max_w = (trackers[:, 2] - trackers[:, 0]).max()
+  lo = np.searchsorted(x1s, detections[:, 0] - max_w, side='left')
+  hi = np.searchsorted(x1s, detections[:, 2], side='left')
+  counts = np.maximum(hi - lo, 0)
+  det_idx = np.repeat(np.arange(len(detections)), counts)
+  offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+  trk_idx = order[np.repeat(lo, counts) + offsets]
+  return det_idx, trk_idx
+
+
 def associate_detections_to_trackers(detections,trackers,iou_threshold = 0.3):
+  """
+  Assigns detections to tracked objects (both represented as bounding boxes).
 
+  Only spatially overlapping pairs are scored. When the above-threshold pairs
+  are not already one-to-one, the solver only sees the boxes that compete for
+  more than one partner, which gives the same matches as one global assignment
+  since non-overlapping pairs contribute nothing.
+
+  Returns 3 lists of matches, unmatched_detections and unmatched_trackers
+  """
   if(len(trackers)==0):
     return np.empty((0,2),dtype=int), np.arange(len(detections)), np.empty((0,5),dtype=int)
+  if(len(detections)==0):
+    return np.empty((0,2),dtype=int), np.empty(0,dtype=int), np.arange(len(trackers))
 
-  iou_matrix = iou_batch(detections, trackers)
-
-  if min(iou_matrix.shape) > 0:
-    a = (iou_matrix > iou_threshold).astype(np.int32)
-    if a.sum(1).max() == 1 and a.sum(0).max() == 1:
-        matched_indices = np.stack(np.where(a), axis=1)
-    else:
-      matched_indices = linear_assignment(-iou_matrix)
+  if len(detections) * len(trackers) <= DENSE_IOU_MAX_PAIRS:
+    iou_matrix = iou_batch(detections, trackers)
+    det_idx, trk_idx = np.nonzero(iou_matrix > 0)
+    iou = iou_matrix[det_idx, trk_idx]
   else:
-    matched_indices = np.empty(shape=(0,2))
-
-  unmatched_detections = []
-  for d, det in enumerate(detections):
-    if(d not in matched_indices[:,0]):
-      unmatched_detections.append(d)
-  unmatched_trackers = []
-  for t, trk in enumerate(trackers):
-    if(t not in matched_indices[:,1]):
-      unmatched_trackers.append(t)
-
-  #filter out matched with low IOU
-  matches = []
-  for m in matched_indices:
-    if(iou_matrix[m[0], m[1]]<iou_threshold):
-      unmatched_detections.append(m[0])
-      unmatched_trackers.append(m[1])
-    else:
-      matches.append(m.reshape(1,2))
-  if(len(matches)==0):
-    matches = np.empty((0,2),dtype=int)
+    det_idx, trk_idx = gate_candidates(detections, trackers)
+    iou = iou_pairs(detections[det_idx], trackers[trk_idx])
+    overlap = iou > 0
+    det_idx, trk_idx, iou = det_idx[overlap], trk_idx[overlap], iou[overlap]
+
+  above = iou > iou_threshold
+  if above.any() and np.bincount(det_idx[above]).max() == 1 and np.bincount(trk_idx[above]).max() == 1:
+    matches = np.stack([det_idx[above], trk_idx[above]], axis=1)
+  elif (iou >= iou_threshold).any():
+    matches = _assign_gated(det_idx, trk_idx, iou, iou_threshold)
   else:
-    matches = np.concatenate(matches,axis=0)
+    matches = np.empty((0,2),dtype=int)
+  matches = matches[np.argsort(matches[:, 0], kind='stable')]
+
+  det_free = np.ones(len(detections), dtype=bool)
+  det_free[matches[:, 0]] = False
+  trk_free = np.ones(len(trackers), dtype=bool)
+  trk_free[matches[:, 1]] = False
+  return matches, np.flatnonzero(det_free), np.flatnonzero(trk_free)
+
+
+def _assign_gated(det_idx, trk_idx, iou, iou_threshold):
+  """
+  Solves the assignment only over boxes that overlap more than one candidate,
+  returns matches with IOU >= iou_threshold. Pairs that only overlap each other
+  are matched directly; the rest form a block-diagonal sub-problem whose
+  optimum equals the global one.
+  """
+  isolated = (np.bincount(det_idx)[det_idx] == 1) & (np.bincount(trk_idx)[trk_idx] == 1)
+  matches = [np.stack([det_idx[isolated], trk_idx[isolated]], axis=1)[iou[isolated] >= iou_threshold]]
 
-  return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+  shared = ~isolated
+  if shared.any():
+    rows, r = np.unique(det_idx[shared], return_inverse=True)
+    cols, c = np.unique(trk_idx[shared], return_inverse=True)
+    sub = np.zeros((len(rows), len(cols)))
+    sub[r, c] = iou[shared]
+    idx = linear_assignment(-sub).astype(int)
+    keep = sub[idx[:, 0], idx[:, 1]] >= iou_threshold
+    matches.append(np.stack([rows[idx[keep, 0]], cols[idx[keep, 1]]], axis=1))
+  return np.concatenate(matches).astype(int)
 
 
 class Sort(object):
@@ -216,7 +274,163 @@ class Sort(object):
       return np.concatenate(ret)
     return np.empty((0,5))
 
+class BatchSort(object):
+  """
+  Drop-in variant of Sort that keeps every track's Kalman state and covariance
+  in stacked arrays and runs predict/update for all tracks at once.
+
+  Uses the same constant-velocity model, noise settings and track lifecycle as
+  KalmanBoxTracker, and draws ids from the same counter, so its output matches Sort.
+  """
+  F = np.array([[1,0,0,0,1,0,0],[0,1,0,0,0,1,0],[0,0,1,0,0,0,1],[0,0,0,1,0,0,0],  [0,0,0,0,1,0,0],[0,0,0,0,0,1,0],[0,0,0,0,0,0,1]], dtype=float)
+  Q = np.diag([1., 1., 1., 1., 0.01, 0.01, 0.0001])
+  R = np.diag([1., 1., 10., 10.])
+  P0 = np.diag([10., 10., 10., 10., 10000., 10000., 10000.])
+
+  def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+
+    self.max_age = max_age
+    self.min_hits = min_hits
+    self.iou_threshold = iou_threshold
+    self.frame_count = 0
+    self.x = np.zeros((0, 7))
+    self.P = np.zeros((0, 7, 7))
+    self.ids = np.zeros(0, dtype=int)
+    self.time_since_update = np.zeros(0, dtype=int)
+    self.hits = np.zeros(0, dtype=int)
+    self.hit_streak = np.zeros(0, dtype=int)
+    self.age = np.zeros(0, dtype=int)
+    self.dropped = np.zeros(0, dtype=int)
+    self.last_predicted = 0
+    self.last_match_iou = np.empty(0)
+
+  def __len__(self):
+    return len(self.ids)
+
+  def _keep(self, mask):
+    for name in ('x', 'P', 'ids', 'time_since_update', 'hits', 'hit_streak', 'age', 'dropped'):
+      setattr(self, name, getattr(self, name)[mask])
+
+  @staticmethod
+  def bbox_to_z(bboxes):
+    """Vectorised convert_bbox_to_z over an (N,4+) array, returns (N,4)"""
+    w = bboxes[:, 2] - bboxes[:, 0]
+    h = bboxes[:, 3] - bboxes[:, 1]
+    return np.stack([bboxes[:, 0] + w/2., bboxes[:, 1] + h/2., w * h, w / h], axis=1)
+
+  @staticmethod
+  def x_to_bbox(x):
+    """Vectorised convert_x_to_bbox over an (N,7) state array, returns (N,4)"""
+    w = np.sqrt(x[:, 2] * x[:, 3])
+    h = x[:, 2] / w
+    return np.stack([x[:, 0] - w/2., x[:, 1] - h/2., x[:, 0] + w/2., x[:, 1] + h/2.], axis=1)
+
+  def _advance(self):
+    self.x[(self.x[:, 6] + self.x[:, 2]) <= 0, 6] *= 0.0
+    self.x = self.x @ self.F.T
+    self.P = self.F @ self.P @ self.F.T + self.Q
+
+  def _live(self):
+    return (self.time_since_update < 1) & ((self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
+
+  def predict(self):
+    """Advance every track one frame and return the predicted boxes (N,4)"""
+    self._advance()
+    self.age += 1
+    self.hit_streak[self.time_since_update > 0] = 0
+    self.time_since_update += 1
+    return self.x_to_bbox(self.x)
+
+  def correct(self, idx, bboxes):
+    """Kalman update of the tracks at idx with their matched boxes"""
+    if len(idx) == 0:
+      return
+    x, P = self.x[idx], self.P[idx]
+    y = self.bbox_to_z(bboxes) - x[:, :4]
+    PHT = P[:, :, :4]
+    S = PHT[:, :4, :] + self.R
+    K = PHT @ np.linalg.inv(S)
+    x = x + (K @ y[:, :, None])[:, :, 0]
+    I_KH = np.broadcast_to(np.eye(7), P.shape).copy()
+    I_KH[:, :, :4] -= K
+    self.P[idx] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ self.R @ K.transpose(0, 2, 1)
+    self.x[idx] = x
+    self.time_since_update[idx] = 0
+    self.dropped[idx] = 0
+    self.hits[idx] += 1
+    self.hit_streak[idx] += 1
+
+  def spawn(self, bboxes):
+    """Start a new track for each box"""
+    n = len(bboxes)
+    if n == 0:
+      return
+    x = np.zeros((n, 7))
+    x[:, :4] = self.bbox_to_z(bboxes)
+    self.x = np.concatenate([self.x, x])
+    self.P = np.concatenate([self.P, np.broadcast_to(self.P0, (n, 7, 7))])
+    self.ids = np.concatenate([self.ids, np.arange(KalmanBoxTracker.count, KalmanBoxTracker.count + n)])
+    KalmanBoxTracker.count += n
+    zeros = np.zeros(n, dtype=int)
+    self.time_since_update = np.concatenate([self.time_since_update, zeros])
+    self.hits = np.concatenate([self.hits, zeros])
+    self.hit_streak = np.concatenate([self.hit_streak, zeros])
+    self.age = np.concatenate([self.age, zeros])
+    self.dropped = np.concatenate([self.dropped, zeros])
+
+  def update(self, dets=np.empty((0, 5))):
+
+    self.frame_count += 1
+    pos = self.predict()
+    valid = ~np.any(np.isnan(pos), axis=1)
+    if not valid.all():
+      self._keep(valid)
+      pos = pos[valid]
+    trks = np.concatenate([pos, np.zeros((len(pos), 1))], axis=1)
+    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(dets, trks, self.iou_threshold)
+
+    self.last_predicted = len(trks)
+    self.last_match_iou = iou_pairs(dets[matched[:, 0], :4], trks[matched[:, 1], :4])
+    if len(matched) > 0:
+      self.correct(matched[:, 1], dets[matched[:, 0], :4])
+    self.spawn(dets[np.asarray(unmatched_dets, dtype=int), :4])
+
+    live = self._live()
+    ret = np.concatenate([self.x_to_bbox(self.x[live]), self.ids[live, None] + 1], axis=1)[::-1]
+    self._keep(self.time_since_update + self.dropped <= self.max_age)
+    if(len(ret)>0):
+      return ret
+    return np.empty((0,5))
+
+  def coast(self, dropped=False):
+    """
+    Advances all tracks one frame on the motion model alone, for frames where
+    detection was skipped. Track ages and hit streaks are left untouched, so
+    the lifecycle counts detection frames only. Returns the tracks reported by
+    the last update at their predicted positions, in the same (N,5) format.
+
+    dropped=True is for frames that were not processed at all (a live source
+    running ahead): they count towards max_age like frames without a matching
+    detection, so tracks that are not seen again expire instead of lingering.
+    """
+    self._advance()
+    if dropped:
+      self.dropped += 1
+      self._keep(self.time_since_update + self.dropped <= self.max_age)
+    live = self._live()
+    ret = np.concatenate([self.x_to_bbox(self.x[live]), self.ids[live, None] + 1], axis=1)[::-1]
+    ret = ret[~np.any(np.isnan(ret), axis=1)]
+    if(len(ret)>0):
+      return ret
+    return np.empty((0,5))
+
+  def uncertainty(self):
+    """Positional standard deviation (pixels) of each reported track"""
+    live = self._live()
+    return np.sqrt(self.P[live, 0, 0] + self.P[live, 1, 1])
+
 def parse_args():
+    import argparse
 
     parser = argparse.ArgumentParser(description='SORT demo')
     parser.add_argument('--display', dest='display', help='Display online tracker output (slow) [False]',action='store_true')
@@ -233,6 +447,11 @@ def parse_args():
     return args
 
 if __name__ == '__main__':
+  import glob
+  import time
+  import filterpy.kalman  # loaded up front so the timings below exclude it
+
+  np.random.seed(0)
   # all train
   args = parse_args()
   display = args.display
@@ -244,6 +463,11 @@ if __name__ == '__main__':
     if not os.path.exists('mot_benchmark'):
       print('\n\tERROR: mot_benchmark link not found!\n\n    Create a symbolic link to the MOT benchmark\n    (https://motchallenge.net/data/2D_MOT_2015/#download). E.g.:\n\n    $ ln -s /path/to/MOT2015_challenge/2DMOT2015 mot_benchmark\n\n')
       exit()
+    import matplotlib
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from skimage import io
     plt.ion()
     fig = plt.figure()
     ax1 = fig.add_subplot(111, aspect='equal')
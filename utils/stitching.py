@@ -0,0 +1,104 @@
+import numpy as np
+
+from utils.sort import iou_batch, linear_assignment
+
+
+def match_tracks(prev_frames, next_frames, min_iou=0.3):
+    """
+    Match track IDs of two trackers that both ran over the same frames.
+
+    Each (prev, next) ID pair is scored by its summed IoU divided by the number
+    of frames either track was present in, so a pair only scores 1.0 when the
+    boxes coincide for the whole overlap. Pairs are assigned one-to-one.
+
+    Args:
+        prev_frames (list): (N,5) [x1,y1,x2,y2,id] arrays from the earlier tracker
+        next_frames (list): arrays from the later tracker for the same frames
+        min_iou (float): Lowest score accepted as the same object
+
+    Returns:
+        dict: next ID -> prev ID
+    """
+    iou_sum = {}
+    prev_seen, next_seen = {}, {}
+    for prev, next_ in zip(prev_frames, next_frames):
+        prev_ids = prev[:, 4].astype(int).tolist()
+        next_ids = next_[:, 4].astype(int).tolist()
+        for tid in prev_ids:
+            prev_seen[tid] = prev_seen.get(tid, 0) + 1
+        for tid in next_ids:
+            next_seen[tid] = next_seen.get(tid, 0) + 1
+        if not prev_ids or not next_ids:
+            continue
+
+        iou = iou_batch(next_[:, :4], prev[:, :4])
+        for i, j in zip(*np.nonzero(iou > 0)):
+            key = (next_ids[i], prev_ids[j])
+            iou_sum[key] = iou_sum.get(key, 0.0) + float(iou[i, j])
+
+    if not iou_sum:
+        return {}
+
+    next_index = {tid: i for i, tid in enumerate(sorted({n for n, _ in iou_sum}))}
+    prev_index = {tid: j for j, tid in enumerate(sorted({p for _, p in iou_sum}))}
+    score = np.zeros((len(next_index), len(prev_index)))
+    for (n, p), total in iou_sum.items():
+        score[next_index[n], prev_index[p]] = total / max(next_seen[n], prev_seen[p])
+
+    next_ids = list(next_index)
+    prev_ids = list(prev_index)
+    return {
+        next_ids[i]: prev_ids[j]
+        for i, j in linear_assignment(-score)
+        if score[i, j] >= min_iou
+    }
+
+
+def stitch_segments(segments, min_iou=0.3):
+    """
+    Join independently tracked video segments into one sequence of frames.
+
+    Every segment after the first starts tracking a few frames before its
+    first owned frame. Those warm-up frames were also tracked by the previous
+    segment, so tracks are matched across them and keep the earlier ID. IDs
+    are renumbered from 1 in order of first appearance.
+
+    Args:
+        segments (list): dicts in frame order with 'start' (first frame
+            tracked), 'owned' (first frame this segment outputs) and 'tracks'
+            (one FrameTracks per tracked frame)
+        min_iou (float): Lowest overlap score accepted as the same object
+
+    Returns:
+        tuple: (per-frame FrameTracks list, number of tracks carried across boundaries)
+    """
+    frames = []
+    prev, prev_ids = None, {}
+    next_id = 1
+    carried = 0
+
+    for segment in segments:
+        tracks = segment['tracks']
+        warmup = segment['owned'] - segment['start']
+        ids = {}
+
+        if prev is not None and warmup > 0:
+            offset = segment['start'] - prev['start']
+            shared = [t.tracks for t in prev['tracks'][offset:offset + warmup]]
+            matches = match_tracks(shared, [t.tracks for t in tracks[:len(shared)]], min_iou)
+            ids = {local: prev_ids[prev_local] for local, prev_local in matches.items()
+                   if prev_local in prev_ids}
+            carried += len(ids)
+
+        for frame_tracks in tracks[warmup:]:
+            tracked = frame_tracks.tracks.copy()
+            for i, local in enumerate(tracked[:, 4].astype(int).tolist()):
+                if local not in ids:
+                    ids[local] = next_id
+                    next_id += 1
+                tracked[i, 4] = ids[local]
+            frames.append(frame_tracks._replace(tracks=tracked))
+
+        prev, prev_ids = segment, ids
+
+    return frames, carried
@@ -0,0 +1,154 @@
+import os
+import struct
+import zipfile
+from collections import namedtuple
+
+import numpy as np
+
+# One frame of tracker output: (N,5) [x1,y1,x2,y2,id] array, class label and
+# detection confidence (NaN while coasting) per track, whether YOLO ran
+FrameTracks = namedtuple("FrameTracks", ["tracks", "labels", "confidence", "detected"])
+
+# One row per track per frame, 54 bytes packed. Boxes stay float64 so
+# overlays redrawn from a track file match the original pixel for pixel
+TRACK_DTYPE = np.dtype([
+    ("frame", "<u4"),
+    ("track_id", "<u4"),
+    ("x1", "<f8"), ("y1", "<f8"), ("x2", "<f8"), ("y2", "<f8"),
+    ("cls", "u1"),  # index into the file's class names
+    ("conf", "<f4"),
+    ("vx", "<f4"), ("vy", "<f4"),  # pixels per second
+    ("detected", "?")
+])
+
+META_DTYPE = np.dtype([("fps", "<f8"), ("width", "<u4"), ("height", "<u4"), ("frame_count", "<u4")])
+
+
+def tracks_path_for(video_path):
+    """Track file kept next to a processed video"""
+    return os.path.splitext(video_path)[0] + ".tracks.npz"
+
+
+class TrackWriter:
+    """
+    Collects per-frame tracks while a video is processed and saves them as a
+    single track file: an .npz holding the rows sorted by frame ('tracks'),
+    the class names ('names') and video metadata ('meta').
+    """
+
+    def __init__(self):
+        self.names = []
+        self._class_index = {}
+        self._chunks = []
+        self.frame_count = 0
+
+    def _class_ids(self, labels):
+        ids = np.empty(len(labels), dtype=np.uint8)
+        for i, label in enumerate(labels):
+            cls = self._class_index.get(label)
+            if cls is None:
+                cls = self._class_index[label] = len(self.names)
+                self.names.append(label)
+            ids[i] = cls
+        return ids
+
+    def append(self, frame_tracks, velocities):
+        """Add the next frame; velocities is an (N,2) array in track order"""
+        tracks = frame_tracks.tracks
+        rows = np.empty(len(tracks), dtype=TRACK_DTYPE)
+        rows["frame"] = self.frame_count
+        rows["track_id"] = tracks[:, 4]
+        for i, name in enumerate(("x1", "y1", "x2", "y2")):
+            rows[name] = tracks[:, i]
+        rows["cls"] = self._class_ids(frame_tracks.labels)
+        rows["conf"] = frame_tracks.confidence
+        rows["vx"] = velocities[:, 0]
+        rows["vy"] = velocities[:, 1]
+        rows["detected"] = frame_tracks.detected
+        self._chunks.append(rows)
+        self.frame_count += 1
+
+    def save(self, path, fps, width, height, compress=False):
+        """
+        Write the track file. Uncompressed members can be memory-mapped by
+        load_tracks; compressed ones are smaller but must be read into memory.
+        """
+        tracks = np.concatenate(self._chunks) if self._chunks else np.empty(0, dtype=TRACK_DTYPE)
+        meta = np.array([(fps, width, height, self.frame_count)], dtype=META_DTYPE)
+        save = np.savez_compressed if compress else np.savez
+        with open(path, "wb") as f:
+            save(f, tracks=tracks, names=np.array(self.names, dtype=str), meta=meta)
+
+
+class TrackFile:
+    """Tracks loaded by load_tracks, with per-frame access"""
+
+    def __init__(self, tracks, names, meta):
+        self.tracks = tracks
+        self.names = [str(name) for name in names]
+        self.fps = float(meta["fps"])
+        self.width = int(meta["width"])
+        self.height = int(meta["height"])
+        self.frame_count = int(meta["frame_count"])
+        # Rows are sorted by frame, so each frame is one contiguous slice
+        self._bounds = np.searchsorted(tracks["frame"], np.arange(self.frame_count + 1))
+
+    def __len__(self):
+        return self.frame_count
+
+    def rows(self, frame):
+        """Rows of one frame, a view into the (possibly memory-mapped) array"""
+        return self.tracks[self._bounds[frame]:self._bounds[frame + 1]]
+
+    def frame(self, frame):
+        """One frame as FrameTracks, as the tracker produced it"""
+        rows = self.rows(frame)
+        tracks = np.stack([rows["x1"], rows["y1"], rows["x2"], rows["y2"], rows["track_id"]], axis=1)
+        labels = [self.names[cls] for cls in rows["cls"].tolist()]
+        detected = bool(rows["detected"][0]) if len(rows) else False
+        return FrameTracks(tracks, labels, np.asarray(rows["conf"]), detected)
+
+    def __getitem__(self, frame):
+        return self.frame(frame)
+
+    def __iter__(self):
+        for i in range(self.frame_count):
+            yield self.frame(i)
+
+
+def _mmap_member(path, zf, name):
+    """Memory-map an uncompressed .npy member of a zip archive, None if it is compressed"""
+    info = zf.getinfo(name + ".npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(path, "rb") as f:
+        # Skip the local file header, whose extra field can differ from the central directory's
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = struct.unpack("<HH", f.read(4))
+        f.seek(name_len + extra_len, 1)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if shape == (0,) or fortran_order:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def load_tracks(path, mmap=True):
+    """
+    Open a track file written by TrackWriter. With mmap the track rows are
+    mapped straight from the file when stored uncompressed, so loading is
+    zero-copy and only the frames actually read are paged in.
+    """
+    with np.load(path) as data:
+        names, meta = data["names"], data["meta"][0]
+        tracks = None
+        if mmap:
+            with zipfile.ZipFile(path) as zf:
+                tracks = _mmap_member(path, zf, "tracks")
+        if tracks is None:
+            tracks = data["tracks"]
+    return TrackFile(tracks, names, meta)
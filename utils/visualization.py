@@ -27,6 +27,71 @@ def overlay_heatmap(frame, heatmap, alpha=0.5):
     colored = cv2.applyColorMap(hmap, cv2.COLORMAP_JET)
     return cv2.addWeighted(frame, 1-alpha, colored, alpha, 0)
 
+class HeatmapAccumulator:
+    """
+    Position heatmap accumulated at reduced resolution with Gaussian splats.
+
+    Keeps a running max so normalisation never rescans the map, and caches the
+    colored full-resolution layer. The layer is only rebuilt every
+    `refresh_every` frames, or sooner once the heat added since the last
+    rebuild exceeds `change_threshold` of the total.
+    """
+
+    def __init__(self, width, height, scale=0.25, sigma=2.0, refresh_every=10, change_threshold=0.05):
+        self.width, self.height = width, height
+        self.scale = scale
+        self.refresh_every = refresh_every
+        self.change_threshold = change_threshold
+
+        low_w, low_h = max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+        self.accum = np.zeros((low_h, low_w), dtype=np.float32)
+
+        self.radius = max(1, int(round(3 * sigma)))
+        ax = np.arange(-self.radius, self.radius + 1, dtype=np.float32)
+        g = np.exp(-(ax ** 2) / (2 * sigma ** 2))
+        self.kernel = np.outer(g, g)  # peak of 1, like a single-pixel increment
+
+        self.max = 0.0
+        self.total = 0.0
+        self.pending = 0.0
+        self.frames_since_refresh = 0
+        self._colored = None
+
+    def add(self, x, y, weight=1.0):
+        """Splat a full-resolution point onto the low-resolution map"""
+        low_h, low_w = self.accum.shape
+        lx, ly = int(x * self.scale), int(y * self.scale)
+        if not (0 <= lx < low_w and 0 <= ly < low_h):
+            return
+        r = self.radius
+        x0, x1 = max(lx - r, 0), min(lx + r + 1, low_w)
+        y0, y1 = max(ly - r, 0), min(ly + r + 1, low_h)
+        region = self.accum[y0:y1, x0:x1]
+        region += weight * self.kernel[y0 - ly + r:y1 - ly + r, x0 - lx + r:x1 - lx + r]
+        self.max = max(self.max, float(region.max()))
+        self.total += weight
+        self.pending += weight
+
+    def colorize(self):
+        """Rebuild the cached colored layer from the current map"""
+        if self.max > 0:
+            hmap = cv2.convertScaleAbs(self.accum, alpha=255.0 / self.max)
+        else:
+            hmap = np.zeros(self.accum.shape, dtype=np.uint8)
+        colored = cv2.applyColorMap(hmap, cv2.COLORMAP_JET)
+        self._colored = cv2.resize(colored, (self.width, self.height), interpolation=cv2.INTER_LINEAR)
+        self.pending = 0.0
+        self.frames_since_refresh = 0
+        return self._colored
+
+    def overlay(self, frame, alpha=0.5):
+        """Blend the (possibly cached) colored layer into frame in place"""
+        self.frames_since_refresh += 1
+        if (self._colored is None or self.frames_since_refresh >= self.refresh_every
+                or self.pending > self.change_threshold * self.total):
+            self.colorize()
+        return cv2.addWeighted(frame, 1 - alpha, self._colored, alpha, 0, dst=frame)
+
 """
 
 
@@ -60,4 +125,99 @@ def draw_tracks(frame, tracks, trails, color=(0, 255, 0)):
             cv2.line(frame, trails[obj_id][j-1], trails[obj_id][j], (0, 0, 255), 2)
 
     return frame
-"""
\ No newline at end of file
+"""
+class TrailStore:
+    """
+    Fixed-length trajectory trails kept in NumPy ring buffers, one row per track.
+
+    Slots are reused once a track has not been seen for `expire_after` frames,
+    and the buffer doubles when more tracks are alive at once than it holds.
+    """
+
+    def __init__(self, trail_len=30, capacity=64, expire_after=None):
+        self.trail_len = trail_len
+        self.expire_after = expire_after
+        self.points = np.zeros((capacity, trail_len, 2), dtype=np.int32)
+        self.head = np.zeros(capacity, dtype=np.int64)
+        self.length = np.zeros(capacity, dtype=np.int64)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.slots = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.frame_idx = 0
+
+    def _grow(self):
+        capacity = len(self.points)
+        self.points = np.concatenate([self.points, np.zeros_like(self.points)])
+        for name in ('head', 'length', 'last_seen'):
+            arr = getattr(self, name)
+            setattr(self, name, np.concatenate([arr, np.zeros_like(arr)]))
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _slot(self, tid):
+        slot = self.slots.get(tid)
+        if slot is None:
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            self.slots[tid] = slot
+            self.head[slot] = 0
+            self.length[slot] = 0
+        return slot
+
+    def append_many(self, tids, xs, ys):
+        """Append one point to each track's trail"""
+        if len(tids) == 0:
+            return
+        slots = np.fromiter((self._slot(tid) for tid in tids), dtype=np.int64, count=len(tids))
+        self.points[slots, self.head[slots], 0] = xs
+        self.points[slots, self.head[slots], 1] = ys
+        self.head[slots] = (self.head[slots] + 1) % self.trail_len
+        self.length[slots] = np.minimum(self.length[slots] + 1, self.trail_len)
+        self.last_seen[slots] = self.frame_idx
+
+    def get(self, tid):
+        """Trail of a track, oldest point first, as an (n,2) int32 array"""
+        slot = self.slots.get(tid)
+        if slot is None:
+            return np.empty((0, 2), dtype=np.int32)
+        n = self.length[slot]
+        idx = (self.head[slot] - n + np.arange(n)) % self.trail_len
+        return self.points[slot, idx]
+
+    def velocity(self, tid, fps):
+        """Velocity from the last two trail points, as update_velocities computes it"""
+        slot = self.slots.get(tid)
+        if slot is None or self.length[slot] < 2:
+            return (0.0, 0.0)
+        last = self.points[slot, (self.head[slot] - 1) % self.trail_len]
+        prev = self.points[slot, (self.head[slot] - 2) % self.trail_len]
+        return (float(last[0] - prev[0]) * fps, float(last[1] - prev[1]) * fps)
+
+    def next_frame(self):
+        """Advance the frame counter and release trails of tracks gone too long"""
+        self.frame_idx += 1
+        if self.expire_after is None:
+            return
+        for tid, slot in list(self.slots.items()):
+            if self.frame_idx - self.last_seen[slot] > self.expire_after:
+                del self.slots[tid]
+                self.free.append(slot)
+
+
+def draw_trails(frame, trail_store, tids, color=(0, 255, 0), thickness=2):
+    """Draw the trails of all given tracks with a single polylines call"""
+    polys = [pts for pts in (trail_store.get(tid) for tid in tids) if len(pts) >= 2]
+    if polys:
+        cv2.polylines(frame, polys, False, color, thickness)
+    return frame
+
+
+def draw_boxes(frame, boxes, color, thickness=2):
+    """Draw many [x1, y1, x2, y2] integer boxes with a single polylines call"""
+    if len(boxes) == 0:
+        return frame
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    polys = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                      np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1).astype(np.int32)
+    cv2.polylines(frame, list(polys), True, color, thickness)
+    return frame